@@ -1,6 +1,6 @@
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
-from werkzeug.security import generate_password_hash
+from Backend.authorisation.hashing import password_hasher
 from Backend.database.models import User, db
 import os
 import re
@@ -48,10 +48,10 @@ def generate_hashed_password(password):
     """
     Arguments: An password string
 
-    Purpose: Generates a secure random SALT as well as a password hash
+    Purpose: Generates a secure random SALT as well as a password hash, computed on the hashing pool (raises PasswordHashingBusy if it is saturated)
     """
     salt = os.urandom(64).hex()
-    hashed_password = generate_password_hash(password + salt, method="pbkdf2:sha256", salt_length=16)
+    hashed_password = password_hasher.hash(password + salt)
     return hashed_password, salt
 
 
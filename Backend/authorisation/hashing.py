@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}")
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # processes per app worker
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 8))  # hashes running or waiting, per app worker
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))  # seconds
+PASSWORD_HASH_RETRY_AFTER = 2  # seconds, sent with a 503 when the pool is saturated
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when the hashing pool already has PASSWORD_HASH_QUEUE jobs (including timed out
+    ones still running), or a job timed out.
+    """
+
+
+def method_id(method: str) -> str:
+    """
+    @return: str, `method` with werkzeug's default parameters filled in, as it appears
+        before the first "$" of a hash made with it
+    """
+    name, *params = method.split(":")
+    if name == "pbkdf2":
+        hash_name = params[0] if params else "sha256"
+        iterations = params[1] if len(params) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    if name == "scrypt":
+        n, r, p = (params + ["32768", "8", "1"][len(params):])[:3]
+        return f"scrypt:{n}:{r}:{p}"
+    return method
+
+
+def needs_rehash(pwhash: str, method: str = PASSWORD_HASH_METHOD) -> bool:
+    return pwhash.split("$", 1)[0] != method_id(method)
+
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _verify(pwhash, password, method, salt_length):
+    # Runs in the pool: checks the password and, if it was hashed with other parameters,
+    # hashes it again with the current ones in the same job
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if needs_rehash(pwhash, method):
+        return True, _hash(password, method, salt_length)
+    return True, None
+
+
+class PasswordHasher:
+    """
+    Runs password hashing on a small process pool, so a burst of logins neither holds
+    the GIL nor ties up request threads beyond PASSWORD_HASH_QUEUE of them. Calls made
+    while the queue is full raise PasswordHashingBusy straight away.
+
+    The pool is started on first use in each process, so gunicorn workers forked from a
+    preloaded app each get their own.
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT,
+                 method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH):
+        self.workers = workers
+        self.timeout = timeout
+        self.method = method
+        self.salt_length = salt_length
+        self._slots = threading.BoundedSemaphore(queue)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # forkserver: forking a process that already runs request threads is unsafe
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy("Password hashing queue is full")
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A job that times out keeps its pool process busy until it finishes, so its slot
+        # is only given back then, not when the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout as e:
+            raise PasswordHashingBusy("Password hashing timed out") from e
+
+    def hash(self, password: str) -> str:
+        """
+        @param password: the password (with the user's salt appended)
+
+        @return: str, the werkzeug hash of `password` with the configured method
+
+        @raises PasswordHashingBusy: if the pool is saturated
+        """
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash: str, password: str) -> tuple[bool, str | None]:
+        """
+        @param pwhash: the stored werkzeug hash
+        @param password: the password to check (with the user's salt appended)
+
+        @return: tuple, (whether the password matches, a new hash to store if it matches but
+            `pwhash` was made with outdated parameters, else None)
+
+        @raises PasswordHashingBusy: if the pool is saturated
+        """
+        return self._run(_verify, pwhash, password, self.method, self.salt_length)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
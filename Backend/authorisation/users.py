@@ -0,0 +1,68 @@
+import os
+
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from pydantic import BaseModel, ConfigDict
+
+from Backend.data.cache import TTLCache
+from Backend.database.models import User, db
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))  # seconds
+
+
+class CachedUser(BaseModel):
+    """
+    Read-only copy of a User row, safe to share between requests and threads.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    user_id: int
+    email: str
+    name: str
+    role: str
+
+
+# User rows by ID, per worker. edit_profile/change_password invalidate their own worker's
+# entry; other workers pick the change up within USER_CACHE_TTL
+user_cache = TTLCache(ttl=USER_CACHE_TTL)
+
+
+def _load_user(user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    return CachedUser(user_id=user.UserID, email=user.Email, name=user.Name, role=user.Role)
+
+
+def get_cached_user(user_id) -> CachedUser | None:
+    """
+    @param user_id: the user's ID, as an int or the string JWT identity
+
+    @return: CachedUser, or None if there is no such user
+    """
+    return user_cache.get(int(user_id), _load_user)
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(int(user_id))
+
+
+def token_claims(user) -> dict:
+    """
+    @param user: User or CachedUser
+
+    @return: dict, the immutable user fields carried in access and refresh tokens
+    """
+    return {"role": user.Role if isinstance(user, User) else user.role}
+
+
+def current_user_role() -> str | None:
+    """
+    @return: str, the role of the user making the request, from the token's claims, or None
+        if the user does not exist. Tokens issued before roles were added to the claims
+        fall back to the user cache.
+    """
+    role = get_jwt().get("role")
+    if role is not None:
+        return role
+    user = get_cached_user(get_jwt_identity())
+    return user.role if user else None
@@ -0,0 +1,106 @@
+"""
+Measures how long `import Backend.app` takes in a fresh interpreter using `python -X importtime`,
+the cost every gunicorn worker pays when it boots. With --history the result is appended
+to a CSV file so startup cost can be tracked across commits.
+
+Usage (from the repository root):
+    python -m Backend.benchmarks.bench_import_time
+    python -m Backend.benchmarks.bench_import_time --runs 10 --top 20 --history import_time.csv
+"""
+import argparse
+import csv
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HISTORY_COLUMNS = ["timestamp", "commit", "module", "runs", "median_ms", "min_ms", "max_ms"]
+
+
+def measure_import(module):
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    @return: dict, top-level package or module name -> cumulative import time in microseconds,
+        with the total under `module`
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPOSITORY_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue  # header line
+        # Nesting depth is the indentation of the name: keep the module and its direct imports
+        if len(name) - len(name.lstrip()) <= 3:
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPOSITORY_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def append_history(filename, row):
+    new_file = not os.path.exists(filename)
+    with open(filename, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=HISTORY_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="Backend.app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest direct imports to list")
+    parser.add_argument("--history", help="CSV file to append the result to; nothing is written without it")
+    args = parser.parse_args()
+
+    measure_import(args.module)  # warm the filesystem and bytecode caches
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    totals = [run[args.module] / 1000 for run in runs]
+
+    print(f"import {args.module}: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}, {args.runs} runs)")
+    slowest = sorted(
+        ((statistics.median(run.get(name, 0) for run in runs) / 1000, name) for name in runs[0]),
+        reverse=True,
+    )
+    print(f"{'module':<40}{'median ms':>12}")
+    for milliseconds, name in slowest[: args.top + 1]:
+        print(f"{name:<40}{milliseconds:>12.1f}")
+
+    if args.history:
+        append_history(args.history, {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "module": args.module,
+            "runs": args.runs,
+            "median_ms": round(statistics.median(totals), 1),
+            "min_ms": round(min(totals), 1),
+            "max_ms": round(max(totals), 1),
+        })
+        print(f"Recorded in {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares encode time and peak allocations of the ways a list endpoint can turn Timetable
+objects into a JSON response:
+
+    default   model_dump(mode="json") per item, then Flask's default json provider
+    orjson    model_dump() per item, then OrjsonProvider
+    adapter   TypeAdapter(list[Timetable]).dump_json straight to bytes (json_list_response)
+
+Usage (from the repository root):
+    python -m Backend.benchmarks.bench_json
+    python -m Backend.benchmarks.bench_json --sizes 10 100 1000 10000 --repeats 200
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from Backend.data.models import Timetable
+from Backend.serialisation import OrjsonProvider, json_list_response
+
+RAMP_TYPES = ("NONE", "MANUAL", "AUTO")
+
+
+def make_timetables(n):
+    return [
+        Timetable(
+            route_id=f"U{i % 7}",
+            route_name=f"U{i % 7}",
+            arrival_min=i % 60,
+            seats_empty=i % 5,
+            ramp_type=RAMP_TYPES[i % 3],
+            vehicle_id=f"v{i}",
+        )
+        for i in range(n)
+    ]
+
+
+def make_encoders():
+    default_app, orjson_app = Flask("default"), Flask("orjson")
+    default_app.json = DefaultJSONProvider(default_app)
+    orjson_app.json = OrjsonProvider(orjson_app)
+
+    def default(timetables):
+        with default_app.app_context():
+            return default_app.json.response([t.model_dump(mode="json") for t in timetables]).get_data()
+
+    def orjson(timetables):
+        with orjson_app.app_context():
+            return orjson_app.json.response([t.model_dump() for t in timetables]).get_data()
+
+    def adapter(timetables):
+        with orjson_app.app_context():
+            return json_list_response(timetables, Timetable).get_data()
+
+    return {"default": default, "orjson": orjson, "adapter": adapter}
+
+
+def measure(encode, timetables, repeats):
+    """
+    @return: tuple, (median encode time in microseconds, peak bytes allocated by one encode)
+    """
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encode(timetables)
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    encode(timetables)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples) * 1e6, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=100)
+    args = parser.parse_args()
+
+    encoders = make_encoders()
+    print(f"{'items':>6}  {'encoder':<10}{'median us':>12}{'peak KiB':>12}{'speed-up':>10}")
+    for size in args.sizes:
+        timetables = make_timetables(size)
+        expected = [t.model_dump(mode="json") for t in timetables]
+        for name, encode in encoders.items():
+            if json.loads(encode(timetables)) != expected:
+                raise AssertionError(f"{name} encodes {size} items differently")
+
+        baseline = None
+        for name, encode in encoders.items():
+            median_us, peak = measure(encode, timetables, args.repeats)
+            baseline = baseline or median_us
+            print(f"{size:>6}  {name:<10}{median_us:>12.1f}{peak / 1024:>12.1f}{baseline / median_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmarks parse_vix_html against the previous BeautifulSoup + pandas parser over a
+corpus of saved VIX stop pages, and checks both produce identical departures.
+The reference parser needs beautifulsoup4, which the backend itself no longer depends on:
+    pip install beautifulsoup4
+
+Usage (from the repository root):
+    python -m Backend.benchmarks.bench_vix_parser CORPUS_DIR
+    python -m Backend.benchmarks.bench_vix_parser CORPUS_DIR --save 0500CCITY424 0500CCITY423
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from Backend.data.models import Timetable
+from Backend.data.status import get_bus_status
+from Backend.data.timetables import parse_vix_html
+from Backend.data.upstream import upstream_get
+
+VIX_URL = "https://www.cambridgeshirebus.info/Text/WebDisplay.aspx?stopRef={}"
+
+
+def reference_parse(html: bytes, now: datetime) -> list[Timetable] | None:
+    """
+    The parser get_timetables_vix used before parse_vix_html, with `now` injected.
+    """
+    soup = BeautifulSoup(bytes.decode(html), "html.parser")
+    table = soup.find("table", {"id": "GridViewRTI"})
+
+    if table is None:
+        return None
+
+    rows = []
+    for table_row in table.find_all("tr")[1:]:
+        row = [elem.text.strip() for elem in table_row.find_all("td")]
+        rows.append(row)
+
+    columns = [colname.text.strip() for colname in table.find_all("th")]
+
+    df = pd.DataFrame(rows, columns=columns)
+
+    df = df.rename(columns={"Service": "route_id", "Time": "arrival_min"})
+    df["route_name"] = df.route_id
+
+    def convert_time_to_min(t):
+        if t == "Due":
+            return 0
+        t = datetime.strptime(t, "%H:%M").time()
+        t = datetime.combine(now.date(), t)
+        if t < now:
+            t += timedelta(days=1)
+        return (t - now).seconds // 60
+
+    df.arrival_min = df.arrival_min.apply(
+        lambda s: int(s.replace(" Mins", "")) if " Mins" in s else convert_time_to_min(s)
+    )
+    df = df.sort_values(by="arrival_min", kind="stable").drop_duplicates(
+        subset="route_id", keep="first"
+    )
+
+    df["vehicle_id"] = "v" + df.index.astype(str)
+    statuses = df.apply(
+        lambda row: get_bus_status(row["vehicle_id"]), result_type="expand", axis=1
+    )
+
+    df = pd.concat([df, statuses], axis=1)
+    df = df[Timetable.model_fields.keys()]
+
+    return [Timetable(**row) for row in df.to_dict(orient="records")]
+
+
+def save_pages(stop_ids, directory):
+    os.makedirs(directory, exist_ok=True)
+    for stop_id in stop_ids:
+        response = upstream_get(VIX_URL.format(stop_id))
+        with open(os.path.join(directory, f"{stop_id}.html"), "wb") as file:
+            file.write(response.content)
+        print(f"Saved {stop_id} ({len(response.content)} bytes)")
+
+
+def time_per_page(parse, pages, now, repeats):
+    """
+    @return: list of float, the median parse time of each page in microseconds
+    """
+    medians = []
+    for html in pages:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            parse(html, now)
+            samples.append(time.perf_counter() - start)
+        medians.append(statistics.median(samples) * 1e6)
+    return medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of saved VIX pages (*.html)")
+    parser.add_argument("--save", nargs="+", metavar="STOP_ID", help="fetch and save these stops' pages first")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.save, args.corpus)
+
+    names = sorted(name for name in os.listdir(args.corpus) if name.endswith(".html"))
+    pages = []
+    for name in names:
+        with open(os.path.join(args.corpus, name), "rb") as file:
+            pages.append(file.read())
+    if not pages:
+        parser.error(f"no .html pages in {args.corpus}")
+
+    now = datetime.now()
+    for name, html in zip(names, pages):
+        expected = reference_parse(html, now)
+        actual = parse_vix_html(html, now)
+        if expected != actual:
+            raise AssertionError(f"{name}: outputs differ\n  reference: {expected}\n  new:       {actual}")
+    print(f"{len(pages)} pages, identical output")
+
+    reference = time_per_page(reference_parse, pages, now, args.repeats)
+    new = time_per_page(parse_vix_html, pages, now, args.repeats)
+    print(f"{'parser':<12}{'median us':>12}{'max us':>12}")
+    print(f"{'reference':<12}{statistics.median(reference):>12.1f}{max(reference):>12.1f}")
+    print(f"{'new':<12}{statistics.median(new):>12.1f}{max(new):>12.1f}")
+    print(f"speed-up: {statistics.median(reference) / statistics.median(new):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
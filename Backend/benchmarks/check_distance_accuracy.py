@@ -0,0 +1,79 @@
+"""
+Accuracy check for calc_coord_distances: samples random city-scale point pairs across
+Great Britain's latitudes and exits non-zero if the haversine or equirectangular
+approximations stray further from the WGS84 geodesic (or from each other) than the
+bounds its docstring states.
+
+Usage (from the repository root):
+    python -m Backend.benchmarks.check_distance_accuracy
+    python -m Backend.benchmarks.check_distance_accuracy --origins 1000 --seed 1
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from Backend.data.spatial import KM_PER_DEGREE_LATITUDE
+from Backend.data.utils import calc_coord_distances
+
+LATITUDES = (50.0, 56.0)
+LONGITUDES = (-5.0, 2.0)
+MAX_DISTANCE_KM = 70
+MIN_DISTANCE_KM = 0.05  # relative error is meaningless at a few metres
+
+# The bounds stated in calc_coord_distances' docstring
+MAX_APPROXIMATION_ERROR = 0.0035  # either approximation vs geodesic
+MAX_APPROXIMATION_DISAGREEMENT = 0.00002  # haversine vs equirectangular
+
+
+def sample(rng, origins, points_per_origin):
+    """
+    @return: iterator of (origin, (N, 2) ndarray of points within MAX_DISTANCE_KM of it)
+    """
+    for _ in range(origins):
+        origin = (rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES))
+        bearings = rng.uniform(0, 2 * np.pi, points_per_origin)
+        distances = rng.uniform(MIN_DISTANCE_KM, MAX_DISTANCE_KM, points_per_origin)
+        latitudes = origin[0] + distances * np.cos(bearings) / KM_PER_DEGREE_LATITUDE
+        longitudes = origin[1] + distances * np.sin(bearings) / (
+            KM_PER_DEGREE_LATITUDE * np.cos(np.radians(origin[0]))
+        )
+        yield origin, np.column_stack((latitudes, longitudes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--origins", type=int, default=200)
+    parser.add_argument("--points", type=int, default=500, help="points per origin")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    worst = {"haversine": 0.0, "equirectangular": 0.0, "disagreement": 0.0}
+    for origin, points in sample(rng, args.origins, args.points):
+        geodesic = calc_coord_distances(points, origin, method="geodesic")
+        haversine = calc_coord_distances(points, origin, method="haversine")
+        equirectangular = calc_coord_distances(points, origin, method="equirectangular")
+        within = (geodesic >= MIN_DISTANCE_KM) & (geodesic <= MAX_DISTANCE_KM)
+
+        for name, distances in (("haversine", haversine), ("equirectangular", equirectangular)):
+            error = np.abs(distances - geodesic)[within] / geodesic[within]
+            worst[name] = max(worst[name], float(error.max(initial=0)))
+        disagreement = np.abs(haversine - equirectangular)[within] / haversine[within]
+        worst["disagreement"] = max(worst["disagreement"], float(disagreement.max(initial=0)))
+
+    failures = 0
+    for name, bound in (
+        ("haversine", MAX_APPROXIMATION_ERROR),
+        ("equirectangular", MAX_APPROXIMATION_ERROR),
+        ("disagreement", MAX_APPROXIMATION_DISAGREEMENT),
+    ):
+        ok = worst[name] <= bound
+        print(f"{'ok' if ok else 'FAIL':<6}{name}: worst {100 * worst[name]:.4f}% (bound {100 * bound:.4f}%)")
+        failures += not ok
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
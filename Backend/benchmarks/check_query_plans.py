@@ -0,0 +1,192 @@
+"""
+Query-plan regression check: seeds a large dataset, EXPLAINs the ORM query behind each
+endpoint and exits non-zero if any of them plans a full (sequential) table scan.
+
+Run it against a scratch database that has been migrated to head; it refuses to seed a
+database that already has users.
+
+Usage (from Backend/, where the app finds data/stops.csv):
+    DATABASE_URL=postgresql://... PYTHONPATH=.. python -m Backend.benchmarks.check_query_plans
+    DATABASE_URL=postgresql://... PYTHONPATH=.. python -m Backend.benchmarks.check_query_plans --reservations 500000
+    DATABASE_URL=postgresql://... PYTHONPATH=.. python -m Backend.benchmarks.check_query_plans --skip-seed
+"""
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from Backend.app import create_app
+from Backend.database.models import (
+    db,
+    Document,
+    Reservations,
+    User,
+    UserReservation,
+    VolunteerReservation,
+)
+from Backend.database.utils import (
+    nearest_reservations_query,
+    sync_stops,
+    upcoming_reservations_count_query,
+    upcoming_reservations_query,
+)
+from Backend.data.stops import get_stops_registry
+
+SEED_BATCH_SIZE = 10_000
+
+
+def insert_batched(model, rows):
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        db.session.execute(insert(model), rows[start : start + SEED_BATCH_SIZE])
+
+
+def seed(users, reservations, seed=0):
+    """
+    Fills the database with `users` users (half volunteers) and `reservations` reservations,
+    90% of them in the past, each linked to a user and most to a volunteer.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    stop_ids = get_stops_registry().ids.tolist()
+
+    sync_stops()
+    insert_batched(User, [
+        {
+            "UserID": user_id,
+            "Email": f"user{user_id}@example.com",
+            "Password": "x",
+            "Name": f"User {user_id}",
+            "Salt": "0" * 128,
+            "Role": "Volunteer" if user_id % 2 else "Disabled",
+        }
+        for user_id in range(1, users + 1)
+    ])
+    insert_batched(Document, [
+        {"UserID": user_id, "Name": f"{user_id}.pdf", "FilePath": f"uploads/{user_id}.pdf", "TempUserID": uuid.UUID(int=rng.getrandbits(128))}
+        for user_id in range(2, users + 1, 2)
+    ])
+    insert_batched(Reservations, [
+        {
+            "ReservationID": reservation_id,
+            "StopID1": rng.choice(stop_ids),
+            "StopID2": rng.choice(stop_ids),
+            "BusID": f"v{rng.randrange(100)}",
+            "VolunteerCount": rng.randrange(3),
+            "Time": now + timedelta(minutes=rng.randint(-60 * 24 * 365, 60 * 24 * 40)),
+        }
+        for reservation_id in range(1, reservations + 1)
+    ])
+    insert_batched(UserReservation, [
+        {"ReservationID": reservation_id, "UserID": rng.randrange(2, users + 1, 2)}
+        for reservation_id in range(1, reservations + 1)
+    ])
+    insert_batched(VolunteerReservation, [
+        {"ReservationID": reservation_id, "UserID": rng.randrange(1, users + 1, 2)}
+        for reservation_id in range(1, reservations + 1)
+        if rng.random() < 0.8
+    ])
+    db.session.commit()
+
+
+def endpoint_queries():
+    """
+    @return: list of (name, Query) pairs, the queries each endpoint runs, with sample parameters
+    """
+    reservation = db.session.query(Reservations).order_by(Reservations.ReservationID.desc()).first()
+    link = db.session.query(VolunteerReservation).first()
+    document = db.session.query(Document).filter(Document.TempUserID.isnot(None)).first()
+    user_id = db.session.query(UserReservation.UserID).first()[0]
+    volunteer_id = link.UserID
+
+    return [
+        ("login", User.query.filter_by(Email=f"user{user_id}@example.com").limit(1)),
+        ("user lookup", User.query.filter_by(UserID=user_id).limit(1)),
+        ("see_reservation (volunteer)",
+            db.session.query(Reservations)
+            .join(VolunteerReservation, Reservations.ReservationID == VolunteerReservation.ReservationID)
+            .filter(VolunteerReservation.UserID == volunteer_id)),
+        ("see_reservation (disabled)",
+            db.session.query(Reservations)
+            .join(UserReservation, Reservations.ReservationID == UserReservation.ReservationID)
+            .filter(UserReservation.UserID == user_id)),
+        ("create_reservation duplicate check",
+            db.session.query(UserReservation)
+            .filter_by(UserID=user_id)
+            .join(Reservations, UserReservation.ReservationID == Reservations.ReservationID)
+            .filter(Reservations.Time == reservation.Time, Reservations.BusID == reservation.BusID)),
+        ("add_volunteer / remove_volunteer",
+            db.session.query(VolunteerReservation).filter_by(UserID=volunteer_id, ReservationID=link.ReservationID).limit(1)),
+        ("reservation by id",
+            db.session.query(Reservations).filter_by(ReservationID=reservation.ReservationID).limit(1)),
+        ("delete_reservation",
+            db.session.query(Reservations).join(UserReservation).filter(UserReservation.UserID == user_id)),
+        ("show_reservations", nearest_reservations_query((52.2113, 0.0911), 5, radius_km=2)),
+        ("show_reservations sparse count", upcoming_reservations_count_query()),
+        ("reservation feed", upcoming_reservations_query(datetime.now(), datetime.now() + timedelta(hours=3))),
+        ("link_document_to_user", Document.query.filter_by(TempUserID=document.TempUserID).limit(1)),
+        ("view_pdf", Document.query.filter_by(UserID=document.UserID).limit(1)),
+    ]
+
+
+def full_scans(query) -> tuple[list[str], str]:
+    """
+    @return: tuple, (tables the plan reads with a full scan, the plan as text)
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect.name == "postgresql":
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        scans, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan":
+                scans.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scans, json.dumps(plan, indent=2)
+
+    if dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        details = [row[-1] for row in rows]
+        scans = [detail.split()[1] for detail in details if detail.startswith("SCAN ") and " INDEX " not in detail]
+        return scans, "\n".join(details)
+
+    raise ValueError(f"EXPLAIN is not supported for {dialect.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--reservations", type=int, default=200_000)
+    parser.add_argument("--skip-seed", action="store_true", help="check the data already in the database")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        if not args.skip_seed:
+            if db.session.query(User).first() is not None:
+                parser.error("the database already has users; use a scratch database or --skip-seed")
+            print(f"Seeding {args.users} users and {args.reservations} reservations...")
+            seed(args.users, args.reservations)
+        if db.session.get_bind().dialect.name == "postgresql":
+            db.session.execute(text("ANALYZE"))
+
+        failures = 0
+        for name, query in endpoint_queries():
+            scans, plan = full_scans(query)
+            print(f"{'FAIL' if scans else 'ok':<6}{name}" + (f": full scan of {', '.join(scans)}" if scans else ""))
+            if scans or args.verbose:
+                print(plan)
+            failures += bool(scans)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
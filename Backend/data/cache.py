@@ -0,0 +1,184 @@
+import threading
+import time
+
+
+class CacheLoadTimeout(TimeoutError):
+    """
+    Raised to a caller that waited `wait_timeout` seconds for another caller's load of the
+    same key without it finishing.
+    """
+
+
+class _Flight:
+    """
+    An upstream load in progress, shared by every caller that missed on the same key.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire `ttl` seconds after they are loaded.
+
+    Concurrent misses for the same key are coalesced (single-flight): the first caller
+    runs the loader while the others wait for its result, so a popular key costs one
+    upstream load per TTL however many requests arrive at once. Loader errors are
+    passed to every waiting caller and are not cached, and neither is a None result
+    (the loader's way of reporting a failed load). Waiters give up after `wait_timeout`
+    seconds, so a hung load cannot hold every thread that wants the same key.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000, wait_timeout: float = 30):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.wait_timeout = wait_timeout
+
+        self._entries = {}  # key -> (expires_at, value)
+        self._flights = {}  # key -> _Flight
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.loads = 0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+
+    def get(self, key, loader):
+        """
+        @param key: hashable, cache key
+        @param loader: callable, called with `key` to load the value on a miss
+
+        @return: the cached or freshly loaded value
+
+        @raises CacheLoadTimeout: if another caller's load of `key` takes over `wait_timeout` seconds
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.event.wait(self.wait_timeout):
+                with self._lock:
+                    self.errors += 1
+                raise CacheLoadTimeout(f"Timed out after {self.wait_timeout}s waiting for {key!r} to load")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        start = time.perf_counter()
+        try:
+            value = loader(key)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._flights[key]
+            flight.error = e
+            flight.event.set()
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            if value is not None:
+                self._store(key, value)
+            del self._flights[key]
+            self.loads += 1
+            self.load_seconds_total += elapsed
+            self.load_seconds_max = max(self.load_seconds_max, elapsed)
+
+        flight.value = value
+        flight.event.set()
+        return value
+
+    def get_many(self, keys, loader) -> dict:
+        """
+        Bulk variant of `get`: every missing key is loaded in a single loader call. Bulk
+        loads are not coalesced with concurrent misses.
+
+        @param keys: iterable of hashable cache keys
+        @param loader: callable, called with the list of missing keys, returns a dict key -> value
+
+        @return: dict, key -> cached or freshly loaded value
+        """
+        values, missing = {}, {}
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    values[key] = entry[1]
+                    self.hits += 1
+                else:
+                    missing[key] = None
+            self.misses += len(missing)
+
+        if missing:
+            start = time.perf_counter()
+            try:
+                loaded = loader(list(missing))
+            except BaseException:
+                with self._lock:
+                    self.errors += 1
+                raise
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                for key in missing:
+                    if loaded[key] is not None:
+                        self._store(key, loaded[key])
+                self.loads += 1
+                self.load_seconds_total += elapsed
+                self.load_seconds_max = max(self.load_seconds_max, elapsed)
+            values.update(loaded)
+        return values
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.maxsize:
+            self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+            while len(self._entries) >= self.maxsize:
+                # Entries are kept in insertion order, so this drops the oldest
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + self.ttl, value)
+
+    def invalidate(self, key=None):
+        """
+        Drops `key` from the cache, or every entry if no key is given.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "ttl_seconds": self.ttl,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else None,
+                "load_ms_avg": 1000 * self.load_seconds_total / self.loads if self.loads else None,
+                "load_ms_max": 1000 * self.load_seconds_max,
+            }
@@ -0,0 +1,139 @@
+import math
+import os
+import threading
+import numpy as np
+
+from .routes import UNKNOWN_DIRECTION, get_route_index
+from .utils import EARTH_RADIUS_KM
+
+AVERAGE_BUS_SPEED = 21  # kmph
+# A vehicle up to this far past a stop along the route is treated as at the stop, not
+# gone: GPS fixes jitter by tens of metres and lag behind the bus
+ETA_PASSED_TOLERANCE_KM = float(os.getenv("ETA_PASSED_TOLERANCE_KM", 0.05))
+
+
+class RouteGeometry:
+    """
+    A route polyline with the cumulative along-route distance of each of its points.
+
+    Points are projected onto a flat plane (km) around the route's centre, which is
+    accurate to well under 0.1% over a city-sized route.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.origin = (float(latitudes.mean()), float(longitudes.mean()))
+        self._km_per_radian_longitude = EARTH_RADIUS_KM * math.cos(math.radians(self.origin[0]))
+
+        x, y = self.to_plane(latitudes, longitudes)
+        self.starts_x, self.starts_y = x[:-1], y[:-1]
+        self.deltas_x, self.deltas_y = np.diff(x), np.diff(y)
+        self.lengths = np.hypot(self.deltas_x, self.deltas_y)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.lengths)))
+
+    def __len__(self):
+        return len(self.lengths)  # number of segments
+
+    def to_plane(self, latitudes, longitudes):
+        """
+        @return: tuple of ndarrays (x, y) in km east and north of the route's centre
+        """
+        x = np.radians(np.asarray(longitudes) - self.origin[1]) * self._km_per_radian_longitude
+        y = np.radians(np.asarray(latitudes) - self.origin[0]) * EARTH_RADIUS_KM
+        return x, y
+
+    def project(self, latitudes, longitudes):
+        """
+        Snaps every point onto its nearest route segment in one vectorised pass.
+
+        @return: tuple of ndarrays (along-route distance in km, distance off the route in km)
+        """
+        x, y = self.to_plane(latitudes, longitudes)
+        x, y = x[:, None], y[:, None]
+
+        # Position of the foot of each point on each segment, as a fraction of the segment
+        squared_lengths = np.where(self.lengths > 0, self.lengths**2, 1.0)
+        t = ((x - self.starts_x) * self.deltas_x + (y - self.starts_y) * self.deltas_y) / squared_lengths
+        t = np.clip(t, 0.0, 1.0)
+        offsets = np.hypot(
+            self.starts_x + t * self.deltas_x - x, self.starts_y + t * self.deltas_y - y
+        )
+
+        segments = np.argmin(offsets, axis=1)
+        rows = np.arange(len(segments))
+        along = self.cumulative[segments] + t[rows, segments] * self.lengths[segments]
+        return along, offsets[rows, segments]
+
+
+_geometries = {}
+_geometries_lock = threading.Lock()
+
+
+def _route_geometries(route_id) -> list[tuple[int, RouteGeometry]]:
+    """
+    @return: list of (direction, RouteGeometry), one per usable pattern of the route in the route index
+    """
+    if route_id not in _geometries:
+        with _geometries_lock:
+            if route_id not in _geometries:
+                _geometries[route_id] = [
+                    (direction, RouteGeometry(latitudes, longitudes))
+                    for direction, latitudes, longitudes in get_route_index().shapes(route_id)
+                    if len(latitudes) >= 2
+                ]
+    return _geometries[route_id]
+
+
+def _arrival_minutes(vehicles_along, stops_along, tolerance_km):
+    remaining = stops_along[None, :] - vehicles_along[:, None]
+    remaining[remaining < -tolerance_km] = np.nan
+    return np.maximum(remaining, 0.0) / AVERAGE_BUS_SPEED * 60
+
+
+def estimate_route_arrivals(route_id, vehicle_latlongs, vehicle_directions, stop_latlongs,
+                            tolerance_km=ETA_PASSED_TOLERANCE_KM) -> np.ndarray | None:
+    """
+    Estimates when every vehicle on a route reaches each of the requested stops, following
+    each vehicle along the route's pattern in its own direction of travel, so buses heading
+    the other way are not timed along this way's shape. Where a direction has several
+    patterns (or the vehicle's direction is unknown), the one passing closest to both the
+    vehicle and the stop is used.
+
+    @param route_id: str, route key from the route index
+    @param vehicle_latlongs: array-like of shape (V, 2), vehicle (latitude, longitude) positions
+    @param vehicle_directions: array-like of shape (V,), GTFS direction_id of each vehicle, -1 if unknown
+    @param stop_latlongs: array-like of shape (K, 2), stop (latitude, longitude) positions
+    @param tolerance_km: float, how far past a stop a vehicle still counts as at it
+
+    @return: ndarray of shape (V, K), minutes until arrival, NaN where the vehicle has passed
+        the stop, or None if the route has no usable shape
+    """
+    geometries = _route_geometries(route_id)
+    if not geometries:
+        return None
+    vehicle_latlongs = np.asarray(vehicle_latlongs, dtype=np.float64).reshape(-1, 2)
+    stop_latlongs = np.asarray(stop_latlongs, dtype=np.float64).reshape(-1, 2)
+    vehicle_directions = np.asarray(vehicle_directions).reshape(-1)
+
+    arrival_mins = np.full((len(vehicle_latlongs), len(stop_latlongs)), np.nan)
+    best_offsets = np.full(arrival_mins.shape, np.inf)
+    for direction, geometry in geometries:
+        runs = np.ones(len(vehicle_directions), dtype=bool)
+        if direction != UNKNOWN_DIRECTION:
+            runs = np.isin(vehicle_directions, (direction, UNKNOWN_DIRECTION))
+        if not runs.any():
+            continue
+
+        vehicles_along, vehicle_offsets = geometry.project(vehicle_latlongs[runs, 0], vehicle_latlongs[runs, 1])
+        stops_along, stop_offsets = geometry.project(stop_latlongs[:, 0], stop_latlongs[:, 1])
+        offsets = vehicle_offsets[:, None] + stop_offsets[None, :]
+        # Patterns sharing a road tie to within rounding; keep the first so a vehicle is
+        # timed along one pattern for every stop
+        closer = offsets < best_offsets[runs] - 0.001
+
+        rows = np.flatnonzero(runs)
+        minutes = _arrival_minutes(vehicles_along, stops_along, tolerance_km)
+        arrival_mins[rows] = np.where(closer, minutes, arrival_mins[rows])
+        best_offsets[rows] = np.where(closer, offsets, best_offsets[rows])
+    return arrival_mins
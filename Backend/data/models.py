@@ -15,3 +15,11 @@ class Autocompletion(BaseModel):
     id: str
     name: str
     street: str
+
+
+class Stop(BaseModel):
+    id: str
+    name: str
+    latitude: float
+    longitude: float
+    street: str
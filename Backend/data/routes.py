@@ -0,0 +1,366 @@
+import logging
+import os
+import shutil
+import threading
+import zipfile
+
+import numpy as np
+
+ROUTE_INDEX_DIRECTORY = "data/route_index"
+ROUTE_INDEX_ARRAYS = (
+    "stop_ids",  # sorted ATCO codes
+    "route_ids",  # route keys, "<operator NOC>:<short name>", e.g. "SCCM:1" (see route_key)
+    "route_names",  # route short names (the SIRI-VM LineRef), e.g. "U1"
+    "stop_route_offsets",  # CSR: routes of stop i are stop_route_values[offsets[i]:offsets[i + 1]]
+    "stop_route_values",
+    "route_pattern_offsets",  # patterns of route j are route_pattern_offsets[j]:route_pattern_offsets[j + 1]
+    "pattern_directions",  # GTFS direction_id of each pattern, -1 if the feed has none
+    "pattern_stop_offsets",  # CSR: ordered stops of pattern k
+    "pattern_stop_values",
+    "pattern_shape_offsets",  # CSR: shape points of pattern k
+    "shape_latitudes",
+    "shape_longitudes",
+)
+UNKNOWN_DIRECTION = -1
+# Used while no route index has been compiled: the routes the app was first built for
+FALLBACK_STOP_ROUTES = {"0500CCITY424": ["U1", "U2"]}
+
+logger = logging.getLogger(__name__)
+
+
+def route_key(operator, short_name) -> str:
+    """
+    Identifies a route by its operator (National Operator Code, the SIRI-VM OperatorRef)
+    and short name (the SIRI-VM LineRef), so different operators' routes sharing a number
+    stay apart. Without an operator the key is the bare short name, which vehicles of
+    any operator with that LineRef match.
+    """
+    return f"{operator}:{short_name}" if operator else short_name
+
+
+def read_gtfs_table(source, name, usecols, dtype=None):
+    """
+    @param source: str, path to a GTFS zip file or a directory of extracted GTFS tables
+    @param name: str, table name, e.g. "stop_times"
+
+    @return: DataFrame, or None if the bundle has no such table
+    """
+    import pandas as pd
+
+    filename = f"{name}.txt"
+    if os.path.isdir(source):
+        path = os.path.join(source, filename)
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, encoding="utf-8-sig")
+
+    with zipfile.ZipFile(source) as bundle:
+        if filename not in bundle.namelist():
+            return None
+        with bundle.open(filename) as file:
+            return pd.read_csv(file, usecols=usecols, dtype=dtype, encoding="utf-8-sig")
+
+
+def _csr(groups, size):
+    """
+    @param groups: dict, row -> list of int values
+    @param size: int, number of rows
+
+    @return: tuple of ndarrays (offsets, values)
+    """
+    counts = np.zeros(size, dtype=np.int64)
+    for row, values in groups.items():
+        counts[row] = len(values)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    values = np.zeros(offsets[-1], dtype=np.int32)
+    for row, row_values in groups.items():
+        values[offsets[row] : offsets[row + 1]] = row_values
+    return offsets, values
+
+
+def compile_route_index(source, directory=ROUTE_INDEX_DIRECTORY):
+    """
+    Compiles a GTFS bundle into the on-disk RouteIndex format.
+
+    Routes are keyed by operator and short name (see `route_key`), the operator being the
+    agency's NOC where agency.txt has one, else its agency_id. Every trip contributes to
+    stop -> routes. Each route has one pattern per direction (and per shape, where the
+    feed has shapes), whose stop sequence and shape come from its trip with the most
+    stops. Patterns without a shape fall back to the positions of their stops.
+
+    @param source: str, path to a GTFS zip file or a directory of extracted GTFS tables
+    @param directory: str, where to write the index
+
+    @return: int, number of routes indexed
+    """
+    import pandas as pd
+
+    stops = read_gtfs_table(source, "stops", ["stop_id", "stop_lat", "stop_lon"], {"stop_id": str})
+    agencies = read_gtfs_table(source, "agency", lambda column: column in ("agency_id", "agency_noc"), str)
+    routes = read_gtfs_table(
+        source, "routes", lambda column: column in ("route_id", "agency_id", "route_short_name"), str
+    )
+    trips = read_gtfs_table(
+        source, "trips", lambda column: column in ("route_id", "trip_id", "direction_id", "shape_id"), str
+    )
+    stop_times = read_gtfs_table(
+        source, "stop_times", ["trip_id", "stop_id", "stop_sequence"],
+        {"trip_id": str, "stop_id": str, "stop_sequence": np.int64},
+    )
+    shapes = read_gtfs_table(
+        source, "shapes", ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"],
+        {"shape_id": str},
+    )
+
+    routes = routes.dropna(subset=["route_short_name"])
+    if "agency_id" not in routes.columns:
+        routes["agency_id"] = None
+    operators = routes["agency_id"]
+    if agencies is not None and {"agency_id", "agency_noc"} <= set(agencies.columns):
+        nocs = agencies.dropna(subset=["agency_noc"]).set_index("agency_id")["agency_noc"]
+        operators = routes["agency_id"].map(nocs).fillna(routes["agency_id"])
+    routes["route_key"] = [
+        route_key(operator if isinstance(operator, str) else None, short_name)
+        for operator, short_name in zip(operators, routes["route_short_name"])
+    ]
+    route_names = dict(zip(routes["route_key"], routes["route_short_name"]))
+
+    trips = trips.merge(routes[["route_id", "route_key"]], on="route_id")
+    for column in ("direction_id", "shape_id"):
+        if column not in trips.columns:
+            trips[column] = None
+    trips["direction_id"] = (
+        pd.to_numeric(trips["direction_id"], errors="coerce").fillna(UNKNOWN_DIRECTION).astype(np.int8)
+    )
+    stop_times = stop_times.merge(trips[["trip_id", "route_key"]], on="trip_id")
+    stop_times = stop_times.sort_values(["trip_id", "stop_sequence"], kind="stable")
+
+    stop_ids = np.array(sorted(stop_times["stop_id"].unique()))
+    route_ids = np.array(sorted(stop_times["route_key"].dropna().unique()))
+    stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+    route_index = {route_id: j for j, route_id in enumerate(route_ids)}
+
+    # stop -> every route calling there
+    pairs = stop_times[["stop_id", "route_key"]].drop_duplicates()
+    stop_routes = {}
+    for stop_id, route_id in pairs.itertuples(index=False):
+        stop_routes.setdefault(stop_index[stop_id], []).append(route_index[route_id])
+    stop_routes = {stop: sorted(routes) for stop, routes in stop_routes.items()}
+
+    # (route, direction, shape) -> stops and shape of its longest trip. Patterns are
+    # grouped by route and ordered longest first within each direction
+    trip_lengths = stop_times.groupby("trip_id", sort=False).size().rename("length")
+    longest = (
+        trips.join(trip_lengths, on="trip_id", how="inner")
+        .sort_values(["length", "trip_id"], ascending=[False, True], kind="stable")
+        .drop_duplicates(["route_key", "direction_id", "shape_id"])
+    )
+    longest = longest.assign(route=longest["route_key"].map(route_index))
+    longest = longest.sort_values(["route", "direction_id"], kind="stable")
+    trip_stops = stop_times[stop_times["trip_id"].isin(longest["trip_id"])]
+    trip_stops = {trip_id: group["stop_id"].tolist() for trip_id, group in trip_stops.groupby("trip_id")}
+
+    shape_points = {}
+    if shapes is not None:
+        shapes = shapes[shapes["shape_id"].isin(longest["shape_id"].dropna())]
+        shapes = shapes.sort_values(["shape_id", "shape_pt_sequence"], kind="stable")
+        for shape_id, group in shapes.groupby("shape_id"):
+            shape_points[shape_id] = (
+                group["shape_pt_lat"].to_numpy(np.float64),
+                group["shape_pt_lon"].to_numpy(np.float64),
+            )
+    stop_latlongs = stops.set_index("stop_id")[["stop_lat", "stop_lon"]]
+
+    pattern_stops, pattern_shapes = {}, []
+    for k, trip in enumerate(longest.itertuples(index=False)):
+        sequence = trip_stops[trip.trip_id]
+        pattern_stops[k] = [stop_index[stop_id] for stop_id in sequence]
+
+        shape = shape_points.get(trip.shape_id)
+        if shape is None:
+            known = stop_latlongs.reindex(sequence).dropna()
+            shape = (known["stop_lat"].to_numpy(np.float64), known["stop_lon"].to_numpy(np.float64))
+        pattern_shapes.append(shape)
+
+    arrays = {
+        "stop_ids": stop_ids,
+        "route_ids": route_ids,
+        "route_names": np.array([route_names[route_id] for route_id in route_ids], dtype=str),
+    }
+    arrays["stop_route_offsets"], arrays["stop_route_values"] = _csr(stop_routes, len(stop_ids))
+    arrays["route_pattern_offsets"] = np.concatenate(
+        ([0], np.cumsum(np.bincount(longest["route"], minlength=len(route_ids))))
+    ).astype(np.int64)
+    arrays["pattern_directions"] = longest["direction_id"].to_numpy(np.int8)
+    arrays["pattern_stop_offsets"], arrays["pattern_stop_values"] = _csr(pattern_stops, len(longest))
+    arrays["pattern_shape_offsets"] = np.concatenate(
+        ([0], np.cumsum([len(latitudes) for latitudes, _ in pattern_shapes]))
+    ).astype(np.int64)
+    arrays["shape_latitudes"] = np.concatenate([np.empty(0)] + [lat for lat, _ in pattern_shapes])
+    arrays["shape_longitudes"] = np.concatenate([np.empty(0)] + [long for _, long in pattern_shapes])
+
+    # Write next to the target and swap it in, so workers never load a partial index
+    temp_directory = f"{directory}.tmp"
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    os.makedirs(temp_directory)
+    for name in ROUTE_INDEX_ARRAYS:
+        np.save(os.path.join(temp_directory, f"{name}.npy"), arrays[name])
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temp_directory, directory)
+    return len(route_ids)
+
+
+class RouteIndex:
+    """
+    Memory-mapped stop -> routes, route -> ordered stops and route -> shape lookups
+    compiled from a GTFS bundle by `compile_route_index`, per direction of travel.
+    """
+
+    def __init__(self, arrays):
+        for name in ROUTE_INDEX_ARRAYS:
+            setattr(self, name, arrays[name])
+        self._stops = {stop_id: i for i, stop_id in enumerate(self.stop_ids.tolist())}
+        self._routes = {route_id: j for j, route_id in enumerate(self.route_ids.tolist())}
+
+    @classmethod
+    def load(cls, directory=ROUTE_INDEX_DIRECTORY):
+        return cls({
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in ROUTE_INDEX_ARRAYS
+        })
+
+    @classmethod
+    def empty(cls):
+        offsets = np.zeros(1, dtype=np.int64)
+        return cls({
+            "stop_ids": np.empty(0, dtype="<U1"),
+            "route_ids": np.empty(0, dtype="<U1"),
+            "route_names": np.empty(0, dtype="<U1"),
+            "stop_route_offsets": offsets,
+            "stop_route_values": np.empty(0, dtype=np.int32),
+            "route_pattern_offsets": offsets,
+            "pattern_directions": np.empty(0, dtype=np.int8),
+            "pattern_stop_offsets": offsets,
+            "pattern_stop_values": np.empty(0, dtype=np.int32),
+            "pattern_shape_offsets": offsets,
+            "shape_latitudes": np.empty(0, dtype=np.float64),
+            "shape_longitudes": np.empty(0, dtype=np.float64),
+        })
+
+    @classmethod
+    def fallback(cls, stop_routes=FALLBACK_STOP_ROUTES):
+        """
+        @return: RouteIndex that only knows which routes call at `stop_routes`' stops, with
+            no stop sequences or shapes
+        """
+        index = cls.empty()
+        stop_ids = sorted(stop_routes)
+        route_ids = sorted({route_id for routes in stop_routes.values() for route_id in routes})
+        columns = {route_id: j for j, route_id in enumerate(route_ids)}
+        stop_route_offsets, stop_route_values = _csr(
+            {i: [columns[route_id] for route_id in stop_routes[stop_id]] for i, stop_id in enumerate(stop_ids)},
+            len(stop_ids),
+        )
+        return cls({
+            name: getattr(index, name) for name in ROUTE_INDEX_ARRAYS
+        } | {
+            "stop_ids": np.array(stop_ids),
+            "route_ids": np.array(route_ids),
+            "route_names": np.array(route_ids),
+            "stop_route_offsets": stop_route_offsets,
+            "stop_route_values": stop_route_values,
+            "route_pattern_offsets": np.zeros(len(route_ids) + 1, dtype=np.int64),
+        })
+
+    def __len__(self):
+        return len(self.route_ids)
+
+    def route_name(self, route_id: str) -> str | None:
+        """
+        @return: str, the route's short name, e.g. "U1", or None if unknown
+        """
+        j = self._routes.get(route_id)
+        return None if j is None else str(self.route_names[j])
+
+    def _patterns(self, route_id, direction=None) -> list[int]:
+        """
+        @return: list of int, the route's patterns in `direction` (and those with no known
+            direction), or all of them if `direction` is None
+        """
+        j = self._routes.get(route_id)
+        if j is None:
+            return []
+        patterns = range(self.route_pattern_offsets[j], self.route_pattern_offsets[j + 1])
+        if direction is None or direction == UNKNOWN_DIRECTION:
+            return list(patterns)
+        return [k for k in patterns if self.pattern_directions[k] in (direction, UNKNOWN_DIRECTION)]
+
+    def routes_for_stop(self, stop_id: str) -> list[str]:
+        i = self._stops.get(stop_id)
+        if i is None:
+            return []
+        values = self.stop_route_values[self.stop_route_offsets[i] : self.stop_route_offsets[i + 1]]
+        return self.route_ids[values].tolist()
+
+    def directions(self, route_id: str) -> list[int]:
+        """
+        @return: list of int, the GTFS direction_ids the route runs in (-1 if the feed has none)
+        """
+        return sorted({int(self.pattern_directions[k]) for k in self._patterns(route_id)})
+
+    def stops_for_route(self, route_id: str, direction: int | None = None) -> list[str]:
+        """
+        @return: list of str, ordered stops of the route's longest pattern in `direction`
+            (in its first direction if None)
+        """
+        patterns = self._patterns(route_id, direction)
+        if not patterns:
+            return []
+        k = patterns[0]
+        values = self.pattern_stop_values[self.pattern_stop_offsets[k] : self.pattern_stop_offsets[k + 1]]
+        return self.stop_ids[values].tolist()
+
+    def shapes(self, route_id: str, direction: int | None = None) -> list[tuple[int, np.ndarray, np.ndarray]]:
+        """
+        @return: list of tuples (direction, latitudes, longitudes), one per pattern of the
+            route in `direction` (every direction if None), longest first within a direction
+        """
+        shapes = []
+        for k in self._patterns(route_id, direction):
+            start, end = self.pattern_shape_offsets[k], self.pattern_shape_offsets[k + 1]
+            shapes.append(
+                (int(self.pattern_directions[k]), self.shape_latitudes[start:end], self.shape_longitudes[start:end])
+            )
+        return shapes
+
+
+_route_index = None
+_route_index_lock = threading.Lock()
+
+
+def get_route_index(directory=ROUTE_INDEX_DIRECTORY) -> RouteIndex:
+    """
+    Returns this process's RouteIndex, loading it on first use. Until one has been compiled,
+    a fallback index with only FALLBACK_STOP_ROUTES is used.
+    """
+    global _route_index
+    if _route_index is None:
+        with _route_index_lock:
+            if _route_index is None:
+                try:
+                    _route_index = RouteIndex.load(directory)
+                except FileNotFoundError:
+                    # Missing, or compiled before the index had every array
+                    logger.warning(
+                        "No usable route index at %s, only the fallback routes are served; "
+                        "run `python -m Backend.data.routes <gtfs.zip>`", directory,
+                    )
+                    _route_index = RouteIndex.fallback()
+    return _route_index
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(f"Indexed {compile_route_index(sys.argv[1])} routes")
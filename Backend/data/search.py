@@ -0,0 +1,78 @@
+import threading
+import numpy as np
+from rapidfuzz import fuzz, process
+
+
+class StopNameIndex:
+    """
+    Prebuilt search index over stop names for autocompletion.
+
+    A query of length L is ranked by `fuzz.ratio` against the first L characters of
+    every (lower-cased) stop name, best first, ties broken by dataset order. For each
+    L the distinct prefixes are computed once and double as an inverted index from
+    prefix to stops, so a query only scores each distinct prefix once in a single
+    batched `process.cdist` call and exact prefix matches skip scoring entirely.
+    """
+
+    def __init__(self, names):
+        self.names = [name.lower() for name in names]
+        self.max_length = max((len(name) for name in self.names), default=0)
+        self._prefix_tables = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_table(self, length: int):
+        """
+        @param length: int, prefix length (capped at the longest name)
+
+        @return: tuple of (distinct prefixes, prefix -> slot dict, per-stop slot array)
+        """
+        length = min(length, self.max_length)
+        table = self._prefix_tables.get(length)
+        if table is None:
+            with self._lock:
+                table = self._prefix_tables.get(length)
+                if table is None:
+                    prefixes = np.array(
+                        [name[:length] for name in self.names], dtype=object
+                    )
+                    distinct, slots = np.unique(prefixes, return_inverse=True)
+                    lookup = {prefix: slot for slot, prefix in enumerate(distinct)}
+                    table = (list(distinct), lookup, slots)
+                    self._prefix_tables[length] = table
+        return table
+
+    def search(self, query: str, limit: int) -> np.ndarray:
+        """
+        @param query: str, the text typed so far
+        @param limit: int, maximum number of results
+
+        @return: ndarray, positions of the best matching stops, best first
+        """
+        query = query.lower()
+        if limit <= 0 or len(self.names) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        distinct, lookup, slots = self._prefix_table(len(query))
+
+        # Every exact prefix match scores 100, the maximum, so if there are enough
+        # of them they are the answer in dataset order.
+        exact_slot = lookup.get(query)
+        if exact_slot is not None:
+            exact = np.flatnonzero(slots == exact_slot)
+            if len(exact) >= limit:
+                return exact[:limit]
+
+        scores = process.cdist([query], distinct, scorer=fuzz.ratio)[0][slots]
+
+        if limit < len(scores):
+            # Keep everything tied with the limit-th best score so ties stay stable
+            threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(len(scores))
+
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order[:limit]]
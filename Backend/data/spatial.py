@@ -0,0 +1,118 @@
+import math
+import numpy as np
+
+from .utils import EARTH_RADIUS_KM, calc_coord_distances
+
+KM_PER_DEGREE_LATITUDE = math.pi / 180 * EARTH_RADIUS_KM
+
+
+class SpatialGrid:
+    """
+    Fixed-size latitude/longitude grid over a set of points.
+
+    Cells are at least `cell_km` wide in both directions, so once every cell up to
+    ring k around the query cell has been scanned, any point not yet seen is more
+    than k * cell_km away. Radius queries therefore only look at the cells around
+    the query point instead of every point.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_km=1.0):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_km = cell_km
+
+        self._max_abs_latitude = (
+            float(np.abs(self.latitudes).max()) if len(self.latitudes) else 0.0
+        )
+        self.cell_latitude = cell_km / KM_PER_DEGREE_LATITUDE
+        self.cell_longitude = cell_km / (
+            KM_PER_DEGREE_LATITUDE * math.cos(math.radians(self._max_abs_latitude))
+        )
+
+        rows = np.floor(self.latitudes / self.cell_latitude).astype(np.int64)
+        cols = np.floor(self.longitudes / self.cell_longitude).astype(np.int64)
+
+        self._cells = {}
+        if len(rows):
+            order = np.lexsort((cols, rows))
+            boundaries = np.flatnonzero(
+                (np.diff(rows[order]) != 0) | (np.diff(cols[order]) != 0)
+            ) + 1
+            for cell in np.split(order, boundaries):
+                self._cells[(int(rows[cell[0]]), int(cols[cell[0]]))] = cell
+            self._bounds = (int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max()))
+        else:
+            self._bounds = None
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_latitude),
+            math.floor(longitude / self.cell_longitude),
+        )
+
+    def _min_cell_km(self, latitude):
+        # Cells shrink east-west towards the poles, so use the narrowest latitude involved
+        max_abs_latitude = max(self._max_abs_latitude, abs(latitude))
+        return min(
+            self.cell_km,
+            self.cell_longitude
+            * KM_PER_DEGREE_LATITUDE
+            * math.cos(math.radians(max_abs_latitude)),
+        )
+
+    def _max_ring(self, row, col):
+        min_row, max_row, min_col, max_col = self._bounds
+        return max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+
+    def _ring(self, row, col, k):
+        """
+        @return: list of ndarrays, the positions in cells exactly k cells away from (row, col)
+        """
+        if k == 0:
+            cell = self._cells.get((row, col))
+            return [] if cell is None else [cell]
+
+        min_row, max_row, min_col, max_col = self._bounds
+        found = []
+        for r in range(max(row - k, min_row), min(row + k, max_row) + 1):
+            if r in (row - k, row + k):
+                cols = range(max(col - k, min_col), min(col + k, max_col) + 1)
+            else:
+                cols = (col - k, col + k)
+            for c in cols:
+                cell = self._cells.get((r, c))
+                if cell is not None:
+                    found.append(cell)
+        return found
+
+    def _distances(self, positions, latlong):
+        points = np.column_stack((self.latitudes[positions], self.longitudes[positions]))
+        return calc_coord_distances(points, latlong)
+
+    def within(self, latitude, longitude, radius_km):
+        """
+        @return: tuple of ndarrays (positions, distances in km) of points within radius_km, nearest first
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        if self._bounds is None:
+            return empty
+
+        row, col = self._cell(latitude, longitude)
+        rings = min(
+            math.ceil(radius_km / self._min_cell_km(latitude)),
+            self._max_ring(row, col),
+        )
+        cells = [cell for k in range(rings + 1) for cell in self._ring(row, col, k)]
+        if not cells:
+            return empty
+
+        positions = np.concatenate(cells)
+        distances = self._distances(positions, (latitude, longitude))
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return positions[order], distances[order]
+
@@ -0,0 +1,129 @@
+import abc
+import csv
+import os
+import threading
+
+from .cache import TTLCache
+
+VEHICLE_STATUS_FILE = os.getenv("VEHICLE_STATUS_FILE")  # CSV of vehicle_id,seats_empty,ramp_type
+VEHICLE_STATUS_TTL = float(os.getenv("VEHICLE_STATUS_TTL", 60))  # seconds
+DEFAULT_STATUS = {"seats_empty": 1, "ramp_type": "MANUAL"}
+RAMP_TYPES = ("NONE", "MANUAL", "AUTO")
+
+
+class VehicleStatusProvider(abc.ABC):
+    """
+    Source of seat and ramp status for vehicles, looked up in bulk.
+    """
+
+    @abc.abstractmethod
+    def get_statuses(self, vehicle_ids) -> dict[str, dict]:
+        """
+        @param vehicle_ids: list of str, vehicle ids
+
+        @return: dict, vehicle_id -> {"seats_empty": int, "ramp_type": str} for every id given
+        """
+
+
+class StubStatusProvider(VehicleStatusProvider):
+    """
+    Reports the same placeholder status for every vehicle.
+    """
+
+    def get_statuses(self, vehicle_ids):
+        return {vehicle_id: dict(DEFAULT_STATUS) for vehicle_id in vehicle_ids}
+
+
+def _parse_status(row) -> dict:
+    """
+    @raises ValueError: if the row has an unknown ramp type or a non-integer seat count
+    """
+    ramp_type = (row["ramp_type"] or "").strip().upper()
+    if ramp_type not in RAMP_TYPES:
+        raise ValueError(f"Unknown ramp type '{ramp_type}' for vehicle {row['vehicle_id']}")
+    return {"seats_empty": int(row["seats_empty"]), "ramp_type": ramp_type}
+
+
+class FileStatusProvider(VehicleStatusProvider):
+    """
+    Reads statuses from a CSV file with vehicle_id, seats_empty and ramp_type columns,
+    reloading it whenever it changes. Vehicles missing from the file, or whose row cannot
+    be read, get the default status.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._statuses = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.filename)
+        if mtime == self._mtime:
+            return self._statuses
+
+        with self._lock:
+            if mtime != self._mtime:
+                statuses = {}
+                with open(self.filename, newline="") as file:
+                    for line, row in enumerate(csv.DictReader(file), start=2):
+                        try:
+                            statuses[row["vehicle_id"]] = _parse_status(row)
+                        except (KeyError, TypeError, ValueError) as e:
+                            # One bad row must not take down every departures lookup
+                            print(f"Skipping {self.filename} line {line}: {e}")
+                self._statuses, self._mtime = statuses, mtime
+        return self._statuses
+
+    def get_statuses(self, vehicle_ids):
+        statuses = self._load()
+        return {
+            vehicle_id: dict(statuses.get(vehicle_id, DEFAULT_STATUS)) for vehicle_id in vehicle_ids
+        }
+
+
+class CachedStatusProvider(VehicleStatusProvider):
+    """
+    Caches another provider's statuses per vehicle for `ttl` seconds, so a page of
+    departures costs at most one bulk lookup for the vehicles not seen recently.
+    """
+
+    def __init__(self, provider: VehicleStatusProvider, ttl=VEHICLE_STATUS_TTL):
+        self.provider = provider
+        self.cache = TTLCache(ttl=ttl)
+
+    def get_statuses(self, vehicle_ids):
+        return self.cache.get_many(vehicle_ids, self.provider.get_statuses)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_status_provider() -> VehicleStatusProvider:
+    """
+    Returns this process's provider: VEHICLE_STATUS_FILE if set, otherwise the stub.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if VEHICLE_STATUS_FILE:
+                    backend = FileStatusProvider(VEHICLE_STATUS_FILE)
+                else:
+                    backend = StubStatusProvider()
+                _provider = CachedStatusProvider(backend)
+    return _provider
+
+
+def get_bus_statuses(vehicle_ids) -> dict[str, dict]:
+    """
+    @param vehicle_ids: iterable of str, vehicle ids
+
+    @return: dict, vehicle_id -> {"seats_empty": int, "ramp_type": str}
+    """
+    return get_status_provider().get_statuses(list(vehicle_ids))
+
+
+def get_bus_status(vehicle_id) -> dict:
+    return get_bus_statuses([vehicle_id])[vehicle_id]
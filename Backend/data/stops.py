@@ -1,86 +1,251 @@
-import requests
 import os
-import pandas as pd
-from io import StringIO
-from rapidfuzz import fuzz
+import threading
+import numpy as np
+from functools import cached_property
+from typing import TYPE_CHECKING
 
 from .utils import gridreference_to_latlong
-from .models import Autocompletion
+from .models import Autocompletion, Stop
+from .spatial import SpatialGrid
+from .upstream import UpstreamUnavailable, upstream_get
 
 STOPS_DATA_FILENAME = "data/stops.csv"
+NAPTAN_URL = "https://naptan.api.dft.gov.uk/v1/access-nodes/"
+NAPTAN_COLUMNS = ["ATCOCode", "CommonName", "Street", "GridType", "Easting", "Northing"]
+STOPS_COLUMNS = ["id", "name", "latitude", "longitude", "street"]  # columns of the stops CSV
+NAPTAN_CHUNK_SIZE = 50_000
 
+# pandas and rapidfuzz are only needed once the stops are loaded, so they are imported
+# where they are used to keep them out of worker startup
+if TYPE_CHECKING:
+    import pandas as pd
+    from .search import StopNameIndex
 
-def fetch_stops_data():
+
+def fetch_stops_data(source=None, area_codes=("050",), chunksize=NAPTAN_CHUNK_SIZE):
     """
-    Fetches bus stop data from the NaPTAN API and saves it in a CSV file.
+    Streams bus stop data from the NaPTAN API (or a saved NaPTAN CSV export) in chunks.
 
-    @param filename: str, where to save the CSV
+    @param source: str, optional path to a saved NaPTAN CSV export, downloaded from the API if None
+    @param area_codes: tuple, ATCO area codes to download, e.g. "050" for Cambridgeshire
+    @param chunksize: int, number of rows per chunk
 
-    @return: DataFrame, bus data in JSON format
+    @return: iterator of DataFrame chunks with the NAPTAN_COLUMNS, or None if the request fails
     """
-    url = "https://naptan.api.dft.gov.uk/v1/access-nodes/"
-    params = {
-        "atcoAreaCodes": "050",  # Cambridge
-        "dataFormat": "csv",
-    }
-    response = requests.get(url, params=params)
-
-    if response.status_code == 200:
-        return pd.read_csv(StringIO(response.text))
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-        return None
+    import pandas as pd
+
+    if source is None:
+        params = {
+            "atcoAreaCodes": ",".join(area_codes),
+            "dataFormat": "csv",
+        }
+        try:
+            response = upstream_get(NAPTAN_URL, params=params, stream=True, timeout=60)
+        except UpstreamUnavailable as e:
+            print(f"Error: {e}")
+            return None
+
+        if response.status_code != 200:
+            print(f"Error: {response.status_code} - {response.text}")
+            return None
+
+        # Let pandas read straight off the socket instead of buffering the body
+        response.raw.decode_content = True
+        source = response.raw
+
+    return pd.read_csv(
+        source,
+        usecols=NAPTAN_COLUMNS,
+        dtype={"ATCOCode": str, "CommonName": str, "Street": str, "GridType": str},
+        encoding="utf-8-sig",
+        chunksize=chunksize,
+    )
 
 
-def save_stops_data(filename=STOPS_DATA_FILENAME):
-    df = fetch_stops_data()
+def naptan_to_stops(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Converts NaPTAN rows to the stops dataset format, transforming all grid references in one call.
+    """
+    import pandas as pd
+
     assert (df.GridType.unique() == "UKOS").all()
 
-    df[["Latitude", "Longitude"]] = df.apply(
-        lambda row: gridreference_to_latlong(row["Easting"], row["Northing"]),
-        axis=1,
-        result_type="expand",
+    latitudes, longitudes = gridreference_to_latlong(
+        df["Easting"].to_numpy(dtype=np.float64), df["Northing"].to_numpy(dtype=np.float64)
     )
-    df = df[["ATCOCode", "CommonName", "Latitude", "Longitude", "Street"]]
-    df = df.rename(
-        columns={
-            "ATCOCode": "id",
-            "CommonName": "name",
-            "Latitude": "latitude",
-            "Longitude": "longitude",
-            "Street": "street",
+    stops = pd.DataFrame(
+        {
+            "id": df["ATCOCode"].to_numpy(),
+            "name": df["CommonName"].to_numpy(),
+            "latitude": latitudes,
+            "longitude": longitudes,
+            "street": df["Street"].fillna(df["CommonName"]).to_numpy(),
         }
     )
+    return stops
+
+
+def save_stops_data(filename=STOPS_DATA_FILENAME, source=None, area_codes=("050",)):
+    """
+    Builds the stops dataset from NaPTAN and writes it to a CSV file, one chunk at a time.
+
+    @param filename: str, where to save the CSV
+    @param source: str, optional path to a saved NaPTAN CSV export, downloaded from the API if None
+    @param area_codes: tuple, ATCO area codes to download when source is None
+
+    @return: int, number of stops written, or None if the download failed
+    """
+    chunks = fetch_stops_data(source=source, area_codes=area_codes)
+    if chunks is None:
+        return None
+
+    # Write next to the target and swap it in, so readers never see a partial file. The
+    # header is written up front so a download with no stops still gives a loadable file
+    temp_filename = f"{filename}.tmp"
+    count = 0
+    try:
+        with open(temp_filename, "w", newline="") as file:
+            file.write(",".join(STOPS_COLUMNS) + "\n")
+            for chunk in chunks:
+                stops = naptan_to_stops(chunk)
+                stops.to_csv(file, index=False, header=False, columns=STOPS_COLUMNS)
+                count += len(stops)
+        os.replace(temp_filename, filename)
+    finally:
+        if os.path.exists(temp_filename):
+            os.unlink(temp_filename)
+    return count
+
+
+class StopsRegistry:
+    """
+    In-memory view of the stops dataset, loaded once per process.
+
+    Exposes O(1) id -> stop lookups and columnar NumPy arrays so callers never
+    need to copy or re-index the underlying DataFrame. Treat it as read-only.
+    """
+
+    def __init__(self, df: "pd.DataFrame"):
+        self.df = df
+        self.ids = df.index.to_numpy(dtype=object)
+        self.names = df["name"].to_numpy(dtype=object)
+        self.streets = df["street"].to_numpy(dtype=object)
+        self.latitudes = df["latitude"].to_numpy(dtype=np.float64)
+        self.longitudes = df["longitude"].to_numpy(dtype=np.float64)
+
+        self._positions = {stop_id: i for i, stop_id in enumerate(self.ids)}
+        self._stops = [
+            Stop(id=stop_id, name=name, latitude=lat, longitude=long, street=street)
+            for stop_id, name, lat, long, street in zip(
+                self.ids, self.names, self.latitudes, self.longitudes, self.streets
+            )
+        ]
+
+    @classmethod
+    def from_csv(cls, filename=STOPS_DATA_FILENAME):
+        import pandas as pd
+
+        if not os.path.exists(filename):
+            save_stops_data(filename)
+        return cls(pd.read_csv(filename, index_col="id"))
 
-    df["street"] = df["street"].fillna(df["name"])
+    def __len__(self):
+        return len(self.ids)
 
-    df.to_csv(filename, index=False)
-    return df
+    def __contains__(self, stop_id):
+        return stop_id in self._positions
+
+    def position(self, stop_id: str) -> int | None:
+        """
+        @param stop_id: str, ATCO code of the stop
+
+        @return: int, row of the stop in the columnar arrays, or None if unknown
+        """
+        return self._positions.get(stop_id)
+
+    def positions(self, stop_ids) -> np.ndarray:
+        """
+        @param stop_ids: iterable of ATCO codes
+
+        @return: ndarray of rows in the columnar arrays, -1 where the stop is unknown
+        """
+        return np.fromiter(
+            (self._positions.get(stop_id, -1) for stop_id in stop_ids), dtype=np.int64
+        )
+
+    @cached_property
+    def name_index(self) -> "StopNameIndex":
+        from .search import StopNameIndex
+
+        return StopNameIndex(self.names)
+
+    @cached_property
+    def spatial_index(self) -> SpatialGrid:
+        return SpatialGrid(self.latitudes, self.longitudes)
+
+    def at(self, position: int) -> Stop:
+        return self._stops[position]
+
+    def get(self, stop_id: str) -> Stop | None:
+        position = self._positions.get(stop_id)
+        if position is None:
+            return None
+        return self._stops[position]
+
+    def latlong(self, stop_id: str) -> tuple[float, float] | None:
+        position = self._positions.get(stop_id)
+        if position is None:
+            return None
+        return (float(self.latitudes[position]), float(self.longitudes[position]))
+
+
+_registries: dict[str, StopsRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_stops_registry(filename=STOPS_DATA_FILENAME) -> StopsRegistry:
+    """
+    Returns the process-wide StopsRegistry for `filename`, loading it on first use.
+    """
+    registry = _registries.get(filename)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(filename)
+            if registry is None:
+                registry = StopsRegistry.from_csv(filename)
+                _registries[filename] = registry
+    return registry
 
 
 def get_stops_data(filename=STOPS_DATA_FILENAME):
-    if not os.path.exists(filename):
-        save_stops_data(filename)
-    df = pd.read_csv(filename, index_col="id")
-    return df
+    """
+    @return: DataFrame, the shared stops frame indexed by id (do not modify it in place)
+    """
+    return get_stops_registry(filename).df
 
 
 def get_autocomplete_stops(name: str, limit: int) -> list[Autocompletion]:
-    name = name.lower()
+    stops = get_stops_registry()
+    return [
+        Autocompletion(id=stops.ids[i], name=stops.names[i], street=stops.streets[i])
+        for i in stops.name_index.search(name, limit)
+    ]
 
-    stops = get_stops_data()
-    stops["prefix"] = stops["name"].str[: len(name)].str.lower()
-    stops["similarity"] = stops.apply(
-        lambda row: fuzz.ratio(row["prefix"], name), axis=1
-    )
-    stops.sort_values(by="similarity", ascending=False, inplace=True)
-    stops_dict = (
-        stops.reset_index()[["id", "name", "street"]]
-        .head(limit)
-        .to_dict(orient="records")
-    )
-    return [Autocompletion(**stop) for stop in stops_dict]
+
+def get_nearby_stops(latitude: float, longitude: float, radius_km: float, limit: int) -> list[tuple[Stop, float]]:
+    """
+    @return: list of (stop, distance in km) pairs within radius_km of the given point, nearest first
+    """
+    stops = get_stops_registry()
+    positions, distances = stops.spatial_index.within(latitude, longitude, radius_km)
+    return [
+        (stops.at(position), distance)
+        for position, distance in zip(positions[:limit].tolist(), distances[:limit].tolist())
+    ]
 
 
 if __name__ == "__main__":
-    save_stops_data()
+    import sys
+
+    # Optionally pass a saved NaPTAN CSV export to build the dataset offline
+    save_stops_data(source=sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,191 +1,217 @@
-import requests
-import xmltodict
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import pandas as pd
-from bs4 import BeautifulSoup
-
-from .stops import get_stops_data
-from .utils import calc_coord_distance
+import numpy as np
+import re
+
+from .cache import CacheLoadTimeout, TTLCache
+from .eta import AVERAGE_BUS_SPEED, estimate_route_arrivals
+from .routes import get_route_index
+from .status import get_bus_statuses
+from .stops import get_stops_registry
+from .upstream import UpstreamUnavailable, upstream_get
+from .utils import calc_coord_distances
+from .vehicles import get_vehicle_poller
 from .models import Timetable
 
-AVERAGE_BUS_SPEED = 21  # kmph
-CAMBRIDGE_BOUNDING_BOX = (0.0800, 52.1700, 0.1600, 52.2300)  # Cambridge
-
+VIX_TABLE_PATTERN = re.compile(
+    rb"""<table\b[^>]*\bid=["']?GridViewRTI\b[^>]*>.*?</table>""", re.DOTALL | re.IGNORECASE
+)
+TIMETABLE_CACHE_TTL = float(os.getenv("TIMETABLE_CACHE_TTL", 20))  # seconds
+TIMETABLE_FETCH_WORKERS = int(os.getenv("TIMETABLE_FETCH_WORKERS", 8))
 
-def fetch_location_data(route_id, bounding_box=CAMBRIDGE_BOUNDING_BOX):
-    """
-    Fetches real-time bus data from the Bus Open Data API.
-    Args:
-            api_key (str): API key for authentication.
-            route_id (str): Route identifier, e.g., 'U1'.
-            bounding_box (tuple): Bounding box coordinates as (minLongitude, minLatitude, maxLongitude, maxLatitude).
-
-    Returns:
-            dict: Bus data in JSON format if the request is successful.
-            None: If the request fails.
-    """
+# Live departures per origin stop, shared by every request in this worker
+timetable_cache = TTLCache(ttl=TIMETABLE_CACHE_TTL)
 
-    api_key = os.getenv("BODS_API_KEY")
+# Bounded pool for fetching several origins' departures at once
+_fetch_pool = ThreadPoolExecutor(
+    max_workers=TIMETABLE_FETCH_WORKERS, thread_name_prefix="timetables"
+)
 
-    url = "https://data.bus-data.dft.gov.uk/api/v1/datafeed/"
-    params = {
-        "api_key": api_key,
-        "lineRef": route_id,
-        "boundingBox": ",".join(map(str, bounding_box)),
-    }
-    response = requests.get(url, params=params)
 
-    if response.status_code == 200:
-        return xmltodict.parse(response.content)
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-        return None
+def get_timetables_by_stop_and_route(stop_id, route_id) -> list[Timetable]:
+    """
+    Estimates when each vehicle on a route reaches a stop, from the latest vehicle snapshot.
 
+    @param route_id: str, route key from the route index (see routes.route_key)
 
-def get_location_df(route_id) -> pd.DataFrame:
-    data = fetch_location_data(route_id=route_id)
-    data = (
-        data.get("Siri", {})
-        .get("ServiceDelivery", {})
-        .get("VehicleMonitoringDelivery", {})
-        .get("VehicleActivity", {})
+    @return: list of Timetable, soonest first
+    """
+    snapshot = get_vehicle_poller().current()
+    positions = snapshot.route(route_id)
+    stop_latlong = get_stops_registry().latlong(stop_id)
+    if len(positions) == 0 or stop_latlong is None:
+        return []
+
+    vehicle_latlongs = np.column_stack(
+        (snapshot.latitudes[positions], snapshot.longitudes[positions])
     )
+    arrival_mins = estimate_route_arrivals(
+        route_id, vehicle_latlongs, snapshot.directions[positions], [stop_latlong]
+    )
+    if arrival_mins is not None:
+        arrival_mins = arrival_mins[:, 0]
+    else:
+        # No route shape to follow, fall back to the straight-line distance
+        distances = calc_coord_distances(vehicle_latlongs, stop_latlong)
+        arrival_mins = distances / AVERAGE_BUS_SPEED * 60
 
-    if isinstance(data, list):
-        data = [data]
-
-    locations = []
-    for bus in data:
-        time = datetime.strptime(bus["RecordedAtTime"], "%Y-%m-%dT%H:%M:%S%z")
-
-        journey = bus["MonitoredVehicleJourney"]
-        vehicle_id = journey["VehicleRef"]
+    # Vehicles that have already passed the stop have no arrival time
+    approaching = np.flatnonzero(~np.isnan(arrival_mins))
+    approaching = approaching[np.argsort(arrival_mins[approaching], kind="stable")]
 
-        latlong = journey["VehicleLocation"]
-        latitude = float(latlong["Latitude"])
-        longitude = float(latlong["Longitude"])
+    vehicle_ids = snapshot.vehicle_ids[positions[approaching]].tolist()
+    statuses = get_bus_statuses(vehicle_ids)
 
-        locations.append(
-            {
-                "time": time,
-                "vehicle_id": vehicle_id,
-                "latitude": latitude,
-                "longitude": longitude,
-            }
+    route_name = get_route_index().route_name(route_id) or route_id
+    timetables = []
+    for i, vehicle_id in zip(approaching, vehicle_ids):
+        timetables.append(
+            Timetable(
+                route_id=route_name,
+                route_name=route_name,
+                arrival_min=int(round(arrival_mins[i])),
+                vehicle_id=vehicle_id,
+                **statuses[vehicle_id],
+            )
         )
-    return pd.DataFrame(locations)
-
-
-def get_bus_status(vehicle_id):
-    return {"seats_empty": 1, "ramp_type": "MANUAL"}
-
+    return timetables
 
-def get_timetables_by_stop_and_route(stop_id, route_id):
-    bus_locations = get_location_df(route_id=route_id)
 
-    df = get_stops_data()
-    stop_latlong = tuple(df.loc[stop_id, ["latitude", "longitude"]])
+def get_routes(stop_id: str) -> list[str]:
+    return get_route_index().routes_for_stop(stop_id)
 
-    bus_locations["distance"] = bus_locations.apply(
-        lambda row: calc_coord_distance(
-            (row["latitude"], row["longitude"]), stop_latlong
-        ),
-        axis=1,
-    )
-    bus_locations["arrival_min"] = bus_locations["distance"] / AVERAGE_BUS_SPEED * 60
-    # bus_locations["arrival_time"] = bus_locations["time"] + pd.to_timedelta(bus_locations["arrival_min"], unit="m")
-    # bus_locations["arrival_time"] = bus_locations["arrival_time"].apply(lambda x: x.isoformat())
 
-    bus_status_df = bus_locations.apply(
-        lambda row: pd.Series(get_bus_status(row["vehicle_id"])), axis=1
-    )
-    bus_locations = pd.concat([bus_locations, bus_status_df], axis=1)
+def get_timetables_BODS(stop_id: str) -> list[Timetable]:
+    timetables = []
+    for route_id in get_routes(stop_id):
+        route_timetables = get_timetables_by_stop_and_route(stop_id, route_id)
 
-    bus_locations[["route_id", "route_name"]] = route_id
+        # Earliest bus along this route
+        if len(route_timetables) > 0:
+            timetables.append(route_timetables[0])
 
-    return bus_locations
+    return timetables
 
 
-def get_routes(stop_id: str) -> list[str]:
-    lookup = {"0500CCITY424": ["U1", "U2"]}
-    return lookup.get(stop_id, [])
+def convert_time_to_min(t: str, now: datetime) -> int:  # e.g. t = "19:23"
+    if t == "Due":
+        return 0
+    t = datetime.combine(now.date(), datetime.strptime(t, "%H:%M").time())
+    if t < now:
+        t += timedelta(days=1)
+    return (t - now).seconds // 60
 
 
-def get_timetables_BODS(stop_id: str) -> list[Timetable]:
-    route_ids = get_routes(stop_id)
+def parse_vix_html(html: bytes, now: datetime | None = None) -> list[Timetable] | None:
+    """
+    Parses the departures in the GridViewRTI table of a VIX stop page.
 
-    timetables = []
-    for route_id in route_ids:
-        route_timetables = get_timetables_by_stop_and_route(stop_id, route_id)
+    Only the table is sliced out of the page and parsed, and its rows become Timetable
+    objects directly: the earliest departure per route, soonest first.
 
-        if len(route_timetables) == 0:
-            continue
+    @param html: bytes, the raw page
+    @param now: datetime, the time "HH:MM" departures are relative to (defaults to now)
 
-        route_timetables.sort_values(by="arrival_min", inplace=True)
+    @return: list of Timetable, or None if the page has no departures table
+    """
+    import lxml.html
 
-        # Earliest bus along this route
-        nextbus = route_timetables.iloc[0]
+    match = VIX_TABLE_PATTERN.search(html)
+    if match is None:
+        return None
 
-        # Timetable object
-        timetable = Timetable(**nextbus.to_dict())
+    table = lxml.html.fragment_fromstring(match.group().decode())
+    columns = [th.text_content().strip() for th in table.iter("th")]
+    service_column, time_column = columns.index("Service"), columns.index("Time")
+
+    now = now or datetime.now()
+    earliest = {}  # route_id -> (arrival_min, row index)
+    for index, table_row in enumerate(table.findall(".//tr")[1:]):
+        row = [elem.text_content().strip() for elem in table_row.iter("td")]
+        route_id, time = row[service_column], row[time_column]
+        arrival_min = (
+            int(time.replace(" Mins", "")) if " Mins" in time else convert_time_to_min(time, now)
+        )
+        if route_id not in earliest or arrival_min < earliest[route_id][0]:
+            earliest[route_id] = (arrival_min, index)
 
-        timetables.append(timetable)
+    departures = sorted(earliest.items(), key=lambda item: item[1])
+    statuses = get_bus_statuses(f"v{index}" for _, (_, index) in departures)
 
+    timetables = []
+    for route_id, (arrival_min, index) in departures:
+        vehicle_id = f"v{index}"
+        timetables.append(
+            Timetable(
+                route_id=route_id,
+                route_name=route_id,
+                arrival_min=arrival_min,
+                vehicle_id=vehicle_id,
+                **statuses[vehicle_id],
+            )
+        )
     return timetables
 
 
-def get_timetables_vix(origin_id: str, destination_id: str) -> list[Timetable]:
+def get_timetables_vix(origin_id: str, destination_id: str) -> list[Timetable] | None:
     url = f"https://www.cambridgeshirebus.info/Text/WebDisplay.aspx?stopRef={origin_id}"
-    html = bytes.decode(requests.get(url).content)
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table", {"id": "GridViewRTI"})
-
-    if table is None:
+    try:
+        response = upstream_get(url)
+    except UpstreamUnavailable as e:
+        print(f"Error: {e}")
         return None
 
-    rows = []
-    for table_row in table.find_all("tr")[1:]:
-        row = [elem.text.strip() for elem in table_row.find_all("td")]
-        rows.append(row)
-
-    columns = [colname.text.strip() for colname in table.find_all("th")]
-
-    df = pd.DataFrame(rows, columns=columns)
-
-    df = df.rename(columns={"Service": "route_id", "Time": "arrival_min"})
-    df["route_name"] = df.route_id
+    if response.status_code != 200:
+        print(f"Error: {response.status_code} - {response.text}")
+        return None
 
-    def convert_time_to_min(t):  # e.g. t = "19:23"
-        if t == "Due":
-            return 0
-        t = datetime.strptime(t, "%H:%M").time()
-        t = datetime.combine(datetime.today(), t)
-        now = datetime.now()
-        if t < now:
-            t += timedelta(days=1)
-        return (t - now).seconds // 60
+    return parse_vix_html(response.content)
 
-    df.arrival_min = df.arrival_min.apply(
-        lambda s: int(s.replace(" Mins", ""))
-        if " Mins" in s
-        else convert_time_to_min(s)
-    )
-    df = df.sort_values(by="arrival_min").drop_duplicates(
-        subset="route_id", keep="first"
-    )
 
-    df["vehicle_id"] = "v" + df.index.astype(str)
-    statuses = df.apply(
-        lambda row: get_bus_status(row["vehicle_id"]), result_type="expand", axis=1
-    )
+def get_timetables(origin_id: str, destination_id: str) -> list[Timetable] | None:
+    """
+    @return: list of Timetable, or None if the departures could not be fetched
+    """
+    # VIX departures only depend on the origin, so cache and coalesce by origin stop
+    try:
+        return timetable_cache.get(
+            origin_id, lambda origin_id: get_timetables_vix(origin_id, destination_id)
+        )
+    except CacheLoadTimeout as e:
+        print(f"Error: {e}")
+        return None
 
-    df = pd.concat([df, statuses], axis=1)
-    df = df[Timetable.model_fields.keys()]
 
-    return [Timetable(**row) for row in df.to_dict(orient="records")]
+def get_timetables_for_origins(journeys) -> dict[str, list[Timetable]]:
+    """
+    Fetches the departures of several origins concurrently, one fetch per distinct origin.
 
+    @param journeys: iterable of (origin_id, destination_id) pairs
 
-def get_timetables(origin_id: str, destination_id: str) -> list[Timetable]:
-    return get_timetables_vix(origin_id, destination_id)
+    @return: dict, origin_id -> list of Timetable (empty if the fetch failed)
+    """
+    origins = {}
+    for origin_id, destination_id in journeys:
+        origins.setdefault(origin_id, destination_id)
 
+    if len(origins) == 1:
+        futures = {}
+    else:
+        futures = {
+            origin_id: _fetch_pool.submit(get_timetables, origin_id, destination_id)
+            for origin_id, destination_id in origins.items()
+        }
+
+    timetables = {}
+    for origin_id, destination_id in origins.items():
+        try:
+            if origin_id in futures:
+                result = futures[origin_id].result()
+            else:
+                result = get_timetables(origin_id, destination_id)
+        except Exception as e:
+            print(f"Error fetching timetables for {origin_id}: {e}")
+            result = None
+        timetables[origin_id] = result or []
+    return timetables
@@ -0,0 +1,211 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 10))  # connections kept per host
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 10))  # seconds
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 2))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", 0.2))  # seconds, doubled per retry
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", 5))  # failed calls
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", 30))  # seconds
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised when an upstream host cannot be reached, or its circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and fails fast for `cooldown`
+    seconds, then lets a single trial call through (half-open) to probe the host.
+    """
+
+    def __init__(self, threshold=UPSTREAM_BREAKER_THRESHOLD, cooldown=UPSTREAM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+def _is_retryable(response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class UpstreamHost:
+    """
+    Keep-alive connection pool, retry policy, circuit breaker and counters for one upstream host.
+    """
+
+    def __init__(self, host, pool_size=UPSTREAM_POOL_SIZE, retries=UPSTREAM_RETRIES,
+                 backoff=UPSTREAM_BACKOFF, timeout=UPSTREAM_TIMEOUT):
+        self.host = host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+
+        # Imported here rather than at module level so workers only load requests once they call out
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._connection_errors = (requests.ConnectionError, requests.Timeout)  # retried
+        self._request_errors = requests.RequestException  # anything else fails the call at once
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+
+    def get(self, url, params=None, stream=False, timeout=None):
+        """
+        Sends an idempotent GET, retrying connection errors, 429s and 5xx responses with jittered
+        exponential backoff.
+
+        @return: Response, the last response received (which may still be an error status)
+        @raises UpstreamUnavailable: if the breaker is open or no response could be received
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise UpstreamUnavailable(f"{self.host} is unavailable (circuit open)")
+
+        response, error = None, None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt > 0:
+                    with self._lock:
+                        self.retried += 1
+                    time.sleep(random.uniform(0.5, 1.5) * self.backoff * 2 ** (attempt - 1))
+
+                start = time.perf_counter()
+                try:
+                    response = self.session.get(
+                        url, params=params, stream=stream, timeout=timeout or self.timeout
+                    )
+                    error = None
+                except self._request_errors as e:
+                    response, error = None, e
+                self._record_latency(time.perf_counter() - start)
+
+                if response is not None and not _is_retryable(response):
+                    self.breaker.record_success()
+                    return response
+                if error is not None and not isinstance(error, self._connection_errors):
+                    break  # e.g. TooManyRedirects or InvalidURL, retrying will not help
+                if response is not None and attempt < self.retries:
+                    response.close()
+        except BaseException:
+            # Still settle the breaker, or a failed half-open trial would keep it refusing calls
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_failure()
+        with self._lock:
+            self.failures += 1
+        if response is None:
+            raise UpstreamUnavailable(f"{self.host} is unavailable: {error}") from error
+        return response
+
+    def _record_latency(self, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.latency_seconds_total += elapsed
+            self.latency_seconds_max = max(self.latency_seconds_max, elapsed)
+
+    def stats(self) -> dict:
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retried": self.retried,
+                "failures": self.failures,
+                "short_circuited": self.short_circuited,
+                "connections_opened": connections,
+                "connections_reused": max(self.requests - connections, 0),
+                "latency_ms_avg": 1000 * self.latency_seconds_total / self.requests if self.requests else None,
+                "latency_ms_max": 1000 * self.latency_seconds_max,
+                "breaker": self.breaker.state,
+            }
+
+
+_hosts: dict[str, UpstreamHost] = {}
+_hosts_lock = threading.Lock()
+
+
+def get_upstream_host(url) -> UpstreamHost:
+    """
+    @return: UpstreamHost, the shared client for the scheme and host of `url`
+    """
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    host = _hosts.get(key)
+    if host is None:
+        with _hosts_lock:
+            host = _hosts.get(key)
+            if host is None:
+                host = UpstreamHost(parts.netloc)
+                _hosts[key] = host
+    return host
+
+
+def upstream_get(url, params=None, stream=False, timeout=None):
+    """
+    GETs `url` through the pooled client for its host. See `UpstreamHost.get`.
+    """
+    return get_upstream_host(url).get(url, params=params, stream=stream, timeout=timeout)
+
+
+def upstream_stats() -> dict:
+    with _hosts_lock:
+        hosts = dict(_hosts)
+    return {host.host: host.stats() for host in hosts.values()}
@@ -1,5 +1,11 @@
-from geopy.distance import geodesic
-from pyproj import Transformer
+import threading
+from functools import cache
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius
+
+# pyproj transformers are not thread-safe, so keep one per thread
+_transformers = threading.local()
 
 
 def calc_coord_distance(latlong1, latlong2):
@@ -11,8 +17,92 @@ def calc_coord_distance(latlong1, latlong2):
 
     @return: float, the distance between latlong1 and latlong2 in kilometres
     """
+    # geopy and pyproj are imported where they are used in this module: they are only needed
+    # off the request hot path (geodesic distances, building the stops dataset) and slow
+    # down worker startup
+    from geopy.distance import geodesic
+
     return geodesic(latlong1, latlong2).kilometers
 
 
+def calc_coord_distances(points, origin, method="haversine"):
+    """
+    Calculates the straight-line distances from many (latitude, longitude) points to one origin.
+
+    Methods:
+        "geodesic": exact distance on the WGS84 ellipsoid (same as `calc_coord_distance`).
+        "haversine": great-circle distance on a sphere of mean Earth radius.
+        "equirectangular": flat projection around the mean latitude, cheapest of the three.
+
+    For city-scale distances (< 70 km, latitudes 50-56 N) both approximations stay within
+    0.35% of the geodesic distance, i.e. under 3.5 m per km; equirectangular and haversine
+    agree to within 0.002% of each other at that range. Both bounds are checked by
+    Backend/benchmarks/check_distance_accuracy.py.
+
+    @param points: array-like of shape (N, 2), (latitude, longitude) pairs
+    @param origin: tuple, (latitude, longitude)
+    @param method: str, one of "haversine", "equirectangular" or "geodesic"
+
+    @return: ndarray of shape (N,), the distance from each point to origin in kilometres
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    latitudes, longitudes = points[:, 0], points[:, 1]
+    origin_latitude, origin_longitude = origin
+
+    if method == "geodesic":
+        _, _, metres = get_wgs84_geod().inv(
+            np.full_like(longitudes, origin_longitude),
+            np.full_like(latitudes, origin_latitude),
+            longitudes,
+            latitudes,
+        )
+        return metres / 1000
+
+    phi1 = np.radians(latitudes)
+    phi0 = np.radians(origin_latitude)
+    dphi = phi1 - phi0
+    dlambda = np.radians(longitudes - origin_longitude)
+
+    if method == "haversine":
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi0) * np.cos(phi1) * np.sin(dlambda / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    if method == "equirectangular":
+        x = dlambda * np.cos((phi0 + phi1) / 2)
+        return EARTH_RADIUS_KM * np.hypot(x, dphi)
+
+    raise ValueError(f"Unknown distance method '{method}'")
+
+
+@cache
+def get_wgs84_geod():
+    """
+    @return: Geod, the WGS84 ellipsoid used for geodesic distances
+    """
+    from pyproj import Geod
+
+    return Geod(ellps="WGS84")
+
+
+def get_grid_transformer():
+    """
+    @return: Transformer, the cached British National Grid (EPSG:27700) -> WGS84 (EPSG:4326) transformer
+    """
+    transformer = getattr(_transformers, "grid", None)
+    if transformer is None:
+        from pyproj import Transformer
+
+        transformer = Transformer.from_crs("epsg:27700", "epsg:4326")
+        _transformers.grid = transformer
+    return transformer
+
+
 def gridreference_to_latlong(easting, northing):
-    return Transformer.from_crs("epsg:27700", "epsg:4326").transform(easting, northing)
+    """
+    Converts British National Grid references to (latitude, longitude).
+
+    @param easting: float or ndarray, easting(s) in metres
+    @param northing: float or ndarray, northing(s) in metres
+
+    @return: tuple, (latitude, longitude), arrays if arrays were given
+    """
+    return get_grid_transformer().transform(easting, northing)
@@ -0,0 +1,315 @@
+import os
+import threading
+import time
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+
+from .routes import UNKNOWN_DIRECTION, route_key
+from .upstream import UpstreamUnavailable, upstream_get
+
+BODS_URL = "https://data.bus-data.dft.gov.uk/api/v1/datafeed/"
+CAMBRIDGE_BOUNDING_BOX = (0.0800, 52.1700, 0.1600, 52.2300)  # Cambridge
+BODS_POLL_INTERVAL = float(os.getenv("BODS_POLL_INTERVAL", 10))  # seconds
+# Positions older than this are not used for ETAs, e.g. while BODS is down
+VEHICLE_SNAPSHOT_MAX_AGE = float(os.getenv("VEHICLE_SNAPSHOT_MAX_AGE", 3 * BODS_POLL_INTERVAL))  # seconds
+BODS_FEED_FILE = os.getenv("BODS_FEED_FILE")  # saved SIRI-VM feed to serve instead of BODS
+# SIRI-VM DirectionRef -> GTFS direction_id, as the BODS GTFS timetables number them
+DIRECTION_IDS = {"outbound": 0, "inbound": 1, "0": 0, "1": 1}
+
+
+def fetch_location_data(route_id=None, bounding_box=CAMBRIDGE_BOUNDING_BOX, feed_file=BODS_FEED_FILE):
+    """
+    Opens the real-time SIRI-VM vehicle feed from the Bus Open Data API as a stream.
+    Args:
+            route_id (str): Optional route identifier, e.g., 'U1'. All routes if None.
+            bounding_box (tuple): Bounding box coordinates as (minLongitude, minLatitude, maxLongitude, maxLatitude).
+            feed_file (str): Optional path to a saved SIRI-VM feed, read instead of calling BODS.
+
+    Returns:
+            file-like: The undecoded SIRI-VM XML stream if the request is successful (close it when done).
+            None: If the request fails.
+    """
+    if feed_file is not None:
+        return open(feed_file, "rb")
+
+    params = {
+        "api_key": os.getenv("BODS_API_KEY"),
+        "boundingBox": ",".join(map(str, bounding_box)),
+    }
+    if route_id is not None:
+        params["lineRef"] = route_id
+
+    try:
+        response = upstream_get(BODS_URL, params=params, stream=True)
+    except UpstreamUnavailable as e:
+        print(f"Error: {e}")
+        return None
+
+    if response.status_code == 200:
+        response.raw.decode_content = True
+        return response.raw
+    else:
+        print(f"Error: {response.status_code} - {response.text}")
+        return None
+
+
+class VehicleArrays:
+    """
+    Preallocated columns for parsed vehicles, doubled in place when full.
+    """
+
+    def __init__(self, capacity=256):
+        self.size = 0
+        self.route_ids = np.empty(capacity, dtype=object)
+        self.operator_ids = np.empty(capacity, dtype=object)
+        self.directions = np.empty(capacity, dtype=np.int8)
+        self.vehicle_ids = np.empty(capacity, dtype=object)
+        self.recorded_at = np.empty(capacity, dtype=np.float64)
+        self.latitudes = np.empty(capacity, dtype=np.float64)
+        self.longitudes = np.empty(capacity, dtype=np.float64)
+
+    def append(self, route_id, operator_id, direction, vehicle_id, recorded_at, latitude, longitude):
+        i = self.size
+        if i == len(self.vehicle_ids):
+            for name in ("route_ids", "operator_ids", "directions", "vehicle_ids", "recorded_at", "latitudes", "longitudes"):
+                column = getattr(self, name)
+                grown = np.empty(2 * len(column), dtype=column.dtype)
+                grown[:i] = column
+                setattr(self, name, grown)
+
+        self.route_ids[i] = route_id
+        self.operator_ids[i] = operator_id
+        self.directions[i] = direction
+        self.vehicle_ids[i] = vehicle_id
+        self.recorded_at[i] = recorded_at
+        self.latitudes[i] = latitude
+        self.longitudes[i] = longitude
+        self.size = i + 1
+
+    def to_dict(self) -> dict[str, np.ndarray]:
+        n = self.size
+        return {
+            "route_ids": self.route_ids[:n],
+            "operator_ids": self.operator_ids[:n],
+            "directions": self.directions[:n],
+            "vehicle_ids": self.vehicle_ids[:n],
+            "recorded_at": self.recorded_at[:n],
+            "latitudes": self.latitudes[:n],
+            "longitudes": self.longitudes[:n],
+        }
+
+
+def parse_vehicle_activity(source, capacity=256) -> dict[str, np.ndarray]:
+    """
+    Incrementally reads each vehicle's route, operator, direction, id, recording time and position from a SIRI-VM feed.
+
+    Each VehicleActivity element is discarded as soon as its fields are read, so memory
+    stays flat however many vehicles the feed holds. Elements with missing fields or
+    unparseable values are skipped and counted.
+
+    @param source: bytes or a binary file-like object with the SIRI-VM XML
+    @param capacity: int, number of vehicles to preallocate for
+
+    @return: dict of equal-length arrays: route_ids (LineRef), operator_ids (OperatorRef,
+        None if absent), directions (GTFS direction_id, -1 if
+        unknown), vehicle_ids, recorded_at (epoch seconds), latitudes, longitudes
+    """
+    from lxml import etree
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    vehicles = VehicleArrays(capacity)
+    skipped = 0
+    for _, activity in etree.iterparse(
+        source, events=("end",), tag="{*}VehicleActivity", resolve_entities=False, no_network=True
+    ):
+        try:
+            journey = activity.find("{*}MonitoredVehicleJourney")
+            location = journey.find("{*}VehicleLocation")
+            direction = (journey.findtext("{*}DirectionRef") or "").strip().lower()
+            fields = (
+                journey.findtext("{*}LineRef"),
+                (journey.findtext("{*}OperatorRef") or "").strip() or None,
+                DIRECTION_IDS.get(direction, UNKNOWN_DIRECTION),
+                journey.findtext("{*}VehicleRef"),
+                datetime.fromisoformat(activity.findtext("{*}RecordedAtTime")).timestamp(),
+                float(location.findtext("{*}Latitude")),
+                float(location.findtext("{*}Longitude")),
+            )
+        except (AttributeError, TypeError, ValueError):
+            # A missing element or an unparseable value: drop this vehicle, not the poll
+            skipped += 1
+        else:
+            vehicles.append(*fields)
+
+        # Free this element and the already-read siblings before it
+        activity.clear()
+        parent = activity.getparent()
+        while activity.getprevious() is not None:
+            del parent[0]
+
+    if skipped:
+        print(f"Skipped {skipped} malformed VehicleActivity elements")
+    return vehicles.to_dict()
+
+
+class VehicleSnapshot:
+    """
+    Positions of every vehicle from one poll, indexed by route and by vehicle.
+
+    Snapshots are never modified after construction, so readers can use whichever
+    snapshot they picked up while the poller swaps in a newer one.
+    """
+
+    def __init__(self, route_ids, operator_ids, directions, vehicle_ids, recorded_at, latitudes, longitudes,
+                 fetched_at=None):
+        self.route_ids = route_ids
+        self.operator_ids = operator_ids
+        self.directions = directions
+        self.vehicle_ids = vehicle_ids
+        self.recorded_at = recorded_at
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.fetched_at = fetched_at
+
+        self.by_vehicle = {vehicle_id: i for i, vehicle_id in enumerate(vehicle_ids)}
+        # Under both the operator's route key and the bare LineRef, see routes.route_key
+        by_route = {}
+        for i, (route_id, operator_id) in enumerate(zip(route_ids, operator_ids)):
+            by_route.setdefault(route_id, []).append(i)
+            if operator_id:
+                by_route.setdefault(route_key(operator_id, route_id), []).append(i)
+        self.by_route = {
+            route_id: np.array(positions, dtype=np.int64) for route_id, positions in by_route.items()
+        }
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            route_ids=np.empty(0, dtype=object),
+            operator_ids=np.empty(0, dtype=object),
+            directions=np.empty(0, dtype=np.int8),
+            vehicle_ids=np.empty(0, dtype=object),
+            recorded_at=np.empty(0, dtype=np.float64),
+            latitudes=np.empty(0, dtype=np.float64),
+            longitudes=np.empty(0, dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.vehicle_ids)
+
+    def route(self, route_id) -> np.ndarray:
+        """
+        @param route_id: str, a route key ("SCCM:1") or a bare LineRef ("1", any operator)
+
+        @return: ndarray, positions of the vehicles currently running `route_id`
+        """
+        return self.by_route.get(route_id, np.empty(0, dtype=np.int64))
+
+
+class VehiclePoller:
+    """
+    Polls every vehicle in a bounding box on a fixed interval in a background thread and
+    atomically swaps in a new VehicleSnapshot after each successful poll. A failed poll
+    keeps the previous snapshot, but `current` stops serving it once it is older than
+    `max_age` seconds.
+    """
+
+    def __init__(self, fetch=fetch_location_data, parse=parse_vehicle_activity, interval=BODS_POLL_INTERVAL,
+                 max_age=VEHICLE_SNAPSHOT_MAX_AGE):
+        self.fetch = fetch
+        self.parse = parse
+        self.interval = interval
+        self.max_age = max_age
+        self.snapshot = VehicleSnapshot.empty()
+        self._empty = self.snapshot
+
+        self.polls = 0
+        self.errors = 0
+        self.poll_seconds_last = None
+
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def current(self) -> VehicleSnapshot:
+        """
+        @return: VehicleSnapshot, the latest snapshot, or an empty one if it is older than `max_age`
+        """
+        snapshot = self.snapshot
+        if snapshot.fetched_at is None or time.time() - snapshot.fetched_at > self.max_age:
+            return self._empty
+        return snapshot
+
+    def poll_once(self):
+        start = time.perf_counter()
+        try:
+            feed = self.fetch()
+            if feed is None:
+                raise ValueError("no vehicle data")
+            try:
+                snapshot = VehicleSnapshot(**self.parse(feed), fetched_at=time.time())
+            finally:
+                feed.close()
+        except Exception as e:
+            self.errors += 1
+            print(f"Vehicle poll failed: {e}")
+        else:
+            self.snapshot = snapshot
+            self.polls += 1
+        finally:
+            self.poll_seconds_last = time.perf_counter() - start
+            self._ready.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.poll_once()
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vehicle-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait_ready(self, timeout=None) -> bool:
+        """
+        Blocks until the first poll has finished (successfully or not).
+        """
+        return self._ready.wait(timeout)
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "vehicles": len(snapshot),
+            "routes": len(set(snapshot.route_ids.tolist())),
+            "polls": self.polls,
+            "errors": self.errors,
+            "snapshot_age_seconds": time.time() - snapshot.fetched_at if snapshot.fetched_at else None,
+            "stale": self.current() is self._empty,
+            "poll_ms_last": 1000 * self.poll_seconds_last if self.poll_seconds_last is not None else None,
+        }
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_vehicle_poller() -> VehiclePoller:
+    """
+    Returns this process's VehiclePoller, starting it on first use without waiting for its
+    first poll. Gunicorn workers start it as they boot (see gunicorn.conf.py).
+    """
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                poller = VehiclePoller()
+                poller.start()
+                _poller = poller
+    return _poller
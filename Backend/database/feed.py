@@ -0,0 +1,303 @@
+import os
+import select
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import orjson
+from flask import current_app
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from Backend.data.timetables import get_timetables_for_origins
+from Backend.data.utils import calc_coord_distances
+from Backend.database.models import db
+from Backend.database.utils import reservation_item, upcoming_reservations_query
+
+FEED_REFRESH_SECONDS = float(os.getenv("FEED_REFRESH_SECONDS", 30))  # recompute at least this often, for ETAs (and other workers' changes without Postgres)
+FEED_DEBOUNCE_SECONDS = float(os.getenv("FEED_DEBOUNCE_SECONDS", 0.5))  # coalesces bursts of notify() into one recompute
+FEED_HORIZON_HOURS = float(os.getenv("FEED_HORIZON_HOURS", 3))  # reservations further ahead are not streamed
+# Open streams per worker. Under gthread each stream holds one of the worker's
+# GUNICORN_THREADS for as long as it is open, so at least one is always left for the
+# other endpoints; streams are meant for the gevent `reservation_stream` service, where
+# each one is a greenlet
+FEED_MAX_SUBSCRIBERS = int(os.getenv("FEED_MAX_SUBSCRIBERS", 500))
+if os.getenv("GUNICORN_WORKER_CLASS", "gthread") == "gthread":
+    FEED_MAX_SUBSCRIBERS = max(min(FEED_MAX_SUBSCRIBERS, int(os.getenv("GUNICORN_THREADS", 4)) - 1), 0)
+FEED_MAX_STREAM_SECONDS = float(os.getenv("FEED_MAX_STREAM_SECONDS", 1800))  # clients reconnect, re-checking their token
+FEED_HEARTBEAT_SECONDS = 15
+FEED_RETRY_MS = 3000  # how long EventSource waits before reconnecting
+FEED_CHANNEL = "reservation_feed"  # Postgres NOTIFY channel every worker's feed listens on
+FEED_LISTEN_RETRY_SECONDS = 5
+
+
+class FeedFull(Exception):
+    """
+    Raised when this worker already serves FEED_MAX_SUBSCRIBERS streams.
+    """
+
+
+class FeedSnapshot:
+    """
+    Immutable view of every upcoming reservation with a live departure: the items as
+    show_reservations returns them (without distance) and their origin coordinates.
+    `version` only changes when the items do.
+    """
+
+    def __init__(self, items, latlongs, version, computed_at=None):
+        self.items = items
+        self.latlongs = latlongs
+        self.version = version
+        self.computed_at = computed_at
+
+    @classmethod
+    def empty(cls) -> "FeedSnapshot":
+        return cls([], np.empty((0, 2)), version=0)
+
+    def within(self, latlong, radius_km) -> dict:
+        """
+        @return: dict, reservation_id -> item with its distance, for items within `radius_km` of `latlong`
+        """
+        if len(self.items) == 0:
+            return {}
+        distances = calc_coord_distances(self.latlongs, latlong)
+        return {
+            self.items[i]["reservation_id"]: self.items[i] | {"distance": float(distances[i])}
+            for i in np.flatnonzero(distances <= radius_km)
+        }
+
+
+def _event(name, data, version) -> str:
+    return f"event: {name}\nid: {version}\ndata: {orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()}\n\n"
+
+
+class FeedStream:
+    """
+    One subscriber's event stream. Its slot is released when the response is closed,
+    even if the stream was never iterated.
+    """
+
+    def __init__(self, feed, events):
+        self._feed = feed
+        self._events = events
+        self._closed = False
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        self._events.close()
+        with self._feed._lock:
+            if not self._closed:
+                self._closed = True
+                self._feed.subscribers -= 1
+
+
+class ReservationFeed:
+    """
+    Shared source for the reservation streams of one worker. A background thread
+    recomputes the snapshot (one DB query plus one timetable fetch per distinct origin)
+    when notify() is called after a reservation changes, in this worker or (on Postgres,
+    through LISTEN/NOTIFY) in any other, and every FEED_REFRESH_SECONDS otherwise. Subscribers wait for a new version and diff it against what they have
+    already sent, so a slow client skips intermediate versions instead of queueing them.
+    """
+
+    def __init__(self, refresh=FEED_REFRESH_SECONDS, debounce=FEED_DEBOUNCE_SECONDS,
+                 horizon_hours=FEED_HORIZON_HOURS, max_subscribers=FEED_MAX_SUBSCRIBERS):
+        self.refresh = refresh
+        self.debounce = debounce
+        self.horizon = timedelta(hours=horizon_hours)
+        self.max_subscribers = max_subscribers
+        self.snapshot = FeedSnapshot.empty()
+
+        self.subscribers = 0
+        self.recomputes = 0
+        self.errors = 0
+        self.recompute_seconds_last = None
+        self.listening = False  # whether the listener holds a LISTEN connection right now
+
+        self._app = None
+        self._thread = None
+        self._listener = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def compute(self, now=None) -> tuple[list, np.ndarray]:
+        """
+        @return: tuple, (items, (N, 2) array of their origin coordinates)
+        """
+        now = now or datetime.now()
+        rows = upcoming_reservations_query(now, now + self.horizon).all()
+        timetables_by_origin = get_timetables_for_origins(
+            (reservation.StopID1, reservation.StopID2) for reservation, _, _ in rows
+        ) if rows else {}
+
+        items, latlongs = [], []
+        for reservation, latitude, longitude in rows:
+            item = reservation_item(reservation, timetables_by_origin)
+            if item is not None:
+                items.append(item)
+                latlongs.append((latitude, longitude))
+        return items, np.asarray(latlongs, dtype=np.float64).reshape(-1, 2)
+
+    def recompute(self):
+        start = time.perf_counter()
+        try:
+            with self._app.app_context():
+                items, latlongs = self.compute()
+        except Exception:
+            self.errors += 1
+            self._app.logger.exception("Reservation feed recompute failed")
+            return
+        finally:
+            self.recompute_seconds_last = time.perf_counter() - start
+
+        self.recomputes += 1
+        with self._changed:
+            snapshot = self.snapshot
+            if snapshot.computed_at is not None and items == snapshot.items:
+                # Nothing changed: only its age is refreshed, and subscribers are not woken
+                self.snapshot = FeedSnapshot(snapshot.items, snapshot.latlongs, snapshot.version, computed_at=time.time())
+                return
+            self.snapshot = FeedSnapshot(items, latlongs, snapshot.version + 1, computed_at=time.time())
+            self._changed.notify_all()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            self.recompute()
+            if self._wake.wait(self.refresh):
+                self._stopped.wait(self.debounce)
+
+    def start(self, app):
+        with self._lock:
+            if self._thread is None:
+                self._app = app
+                self._thread = threading.Thread(target=self._run, name="reservation-feed", daemon=True)
+                self._thread.start()
+                with app.app_context():
+                    url = db.engine.url
+                if url.get_backend_name() == "postgresql":
+                    self._listener = threading.Thread(
+                        target=self._listen, args=(url,), name="reservation-feed-listener", daemon=True
+                    )
+                    self._listener.start()
+
+    def _listen(self, url):
+        """
+        Wakes the feed whenever any worker NOTIFYs FEED_CHANNEL, on a connection of its own
+        outside the pool. After an error it reconnects, and catches up with a recompute.
+        """
+        engine = create_engine(url, poolclass=NullPool)
+        while not self._stopped.is_set():
+            try:
+                connection = engine.raw_connection()
+                try:
+                    listener = connection.driver_connection
+                    listener.autocommit = True
+                    listener.cursor().execute(f"LISTEN {FEED_CHANNEL}")
+                    self.listening = True
+                    self._wake.set()  # changes may have been missed while not listening
+                    while not self._stopped.is_set():
+                        if select.select([listener], [], [], self.refresh)[0]:
+                            listener.poll()
+                            if listener.notifies:
+                                listener.notifies.clear()
+                                self._wake.set()
+                finally:
+                    self.listening = False
+                    connection.close()
+            except Exception:
+                self.errors += 1
+                self._app.logger.exception("Reservation feed listener failed")
+                self._stopped.wait(FEED_LISTEN_RETRY_SECONDS)
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        with self._changed:
+            self._changed.notify_all()
+
+    def notify(self):
+        """
+        Asks every worker's feed for a recompute soon, after a reservation was created,
+        changed or deleted. Call it from the request, after committing; it is safe to call
+        before the feed has started. On Postgres it sends a NOTIFY, which reaches this
+        worker's listener too; otherwise other workers catch up within FEED_REFRESH_SECONDS.
+        """
+        if not self.listening:
+            self._wake.set()
+        if db.session.get_bind().dialect.name != "postgresql":
+            return
+        try:
+            db.session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": FEED_CHANNEL})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._wake.set()
+            current_app.logger.exception("Could not notify other workers of a reservation change")
+
+    def subscribe(self, latlong, radius_km, max_seconds=FEED_MAX_STREAM_SECONDS, heartbeat=FEED_HEARTBEAT_SECONDS):
+        """
+        Opens a stream of the reservations whose origin is within `radius_km` of `latlong`:
+        a "snapshot" event with all of them (nearest first), then a "diff" event with
+        "added", "updated" and "removed" lists whenever that set or any of its items
+        (volunteer count, ETA, ...) changes. Comment lines are sent as heartbeats.
+
+        @return: FeedStream, iterable of str Server-Sent Events; close it when the client goes away
+
+        @raises FeedFull: if this worker already has max_subscribers streams
+        """
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                raise FeedFull(f"{self.subscribers} reservation streams already open")
+            self.subscribers += 1
+        return FeedStream(self, self._events(latlong, radius_km, max_seconds, heartbeat))
+
+    def _events(self, latlong, radius_km, max_seconds, heartbeat):
+        yield f"retry: {FEED_RETRY_MS}\n\n"
+        deadline = time.monotonic() + max_seconds
+        sent, version = None, 0
+        while not self._stopped.is_set() and time.monotonic() < deadline:
+            with self._changed:
+                self._changed.wait_for(
+                    lambda: self.snapshot.version != version or self._stopped.is_set(), timeout=heartbeat
+                )
+            snapshot = self.snapshot
+            if snapshot.version == version:
+                yield ": heartbeat\n\n"
+                continue
+            version = snapshot.version
+
+            visible = snapshot.within(latlong, radius_km)
+            if sent is None:
+                yield _event("snapshot", sorted(visible.values(), key=lambda item: item["distance"]), version)
+            else:
+                diff = {
+                    "added": [item for key, item in visible.items() if key not in sent],
+                    "updated": [item for key, item in visible.items() if key in sent and sent[key] != item],
+                    "removed": [key for key in sent if key not in visible],
+                }
+                if any(diff.values()):
+                    yield _event("diff", diff, version)
+            sent = visible
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "subscribers": self.subscribers,
+            "reservations": len(snapshot.items),
+            "version": snapshot.version,
+            "recomputes": self.recomputes,
+            "errors": self.errors,
+            "listening": self.listening,
+            "snapshot_age_seconds": time.time() - snapshot.computed_at if snapshot.computed_at else None,
+            "recompute_ms_last": 1000 * self.recompute_seconds_last if self.recompute_seconds_last is not None else None,
+        }
+
+
+# This worker's feed, started by the first stream
+reservation_feed = ReservationFeed()
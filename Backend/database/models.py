@@ -1,10 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import check_password_hash
 from enum import Enum
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
+from datetime import datetime
+
+from Backend.authorisation.hashing import password_hasher
 
 db = SQLAlchemy()
 
@@ -21,6 +23,8 @@ class Document(db.Model):
     Name = db.Column(db.String(255), nullable=False)  # Name of the document
     FilePath = db.Column(db.String(255), nullable=False)  # Store the file path instead of binary data
     TempUserID = db.Column(UUID(as_uuid=True), unique=True, nullable=True)  
+    ContentHash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of the file, which is stored at documents.storage.document_path(ContentHash); indexed to check whether a file is still referenced before removing it
+    CreatedAt = db.Column(db.DateTime, nullable=True, default=datetime.now)
 
     # Relationship to User model (optional)
     user = db.relationship('User', backref=db.backref('documents', lazy=True))
@@ -33,16 +37,18 @@ class Document(db.Model):
 class User(db.Model):
     UserID = db.Column(db.Integer, primary_key=True, unique=True)
     Email = db.Column(db.String(150), unique=True, nullable=False)
-    Password = db.Column(db.String(150), nullable=False)
+    Password = db.Column(db.String(255), nullable=False)  # werkzeug hash, up to ~170 chars for scrypt
     Name = db.Column(db.String(150), nullable=False)
     Salt = db.Column(db.CHAR(128), nullable=False)
     Role = db.Column(db.String(16), nullable=False)
 
     def verify_password(self, password):
-        if check_password_hash(self.Password, password + self.Salt):
-            return True
-        else:
-            return False
+        # Checked on the hashing pool; a hash made with outdated parameters is replaced
+        # (the caller commits it) and PasswordHashingBusy propagates if the pool is saturated
+        matches, new_hash = password_hasher.verify(self.Password, password + self.Salt)
+        if new_hash is not None:
+            self.Password = new_hash
+        return matches
 
 
 class AccessibilityRequirement(db.Model):
@@ -77,6 +83,13 @@ class Reservations(db.Model):
     VolunteerCount = db.Column(db.Integer, nullable=False)
     Time = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        # create_reservation's duplicate check, and the upcoming-reservations range in show_reservations
+        db.Index("ix_reservations_time_busid", "Time", "BusID"),
+        # show_reservations joins from nearby stops to their upcoming reservations
+        db.Index("ix_reservations_stopid1_time", "StopID1", "Time"),
+    )
+
     def init(self, StopID1, StopID2, BusID, Time, VolunteerCount):
         self.StopID1 = StopID1
         self.StopID2 = StopID2
@@ -84,6 +97,22 @@ class Reservations(db.Model):
         self.Time = Time
         self.VolunteerCount = VolunteerCount
 
+class Stop(db.Model):
+    """
+    Bus stops from the stops dataset, mirrored into the DB by `flask sync-stops` so that
+    reservations can be filtered and ordered by distance inside the query.
+    """
+    __tablename__ = "stop"
+    StopID = db.Column(db.String(16), primary_key=True)  # ATCO code
+    Name = db.Column(db.String(150), nullable=False)
+    Street = db.Column(db.String(150), nullable=True)
+    Latitude = db.Column(db.Float, nullable=False)
+    Longitude = db.Column(db.Float, nullable=False)
+
+    # Bounding-box range scans filter on both columns
+    __table_args__ = (db.Index("ix_stop_latitude_longitude", "Latitude", "Longitude"),)
+
+
 class VolunteerReservation(db.Model):
     __tablename__ = "Volunteer_to_Reservation"
     UserID = db.Column(db.Integer, db.ForeignKey("user.UserID", ondelete="CASCADE"))
@@ -92,6 +121,9 @@ class VolunteerReservation(db.Model):
         db.ForeignKey("reservations.ReservationID", ondelete="CASCADE"),
         primary_key = True
     )
+
+    # A volunteer's reservations (see_reservation, add_volunteer, remove_volunteer)
+    __table_args__ = (db.Index("ix_volunteer_to_reservation_userid", "UserID", "ReservationID"),)
     
 
 class UserReservation(db.Model):
@@ -104,6 +136,9 @@ class UserReservation(db.Model):
         autoincrement=True
     )
 
+    # A user's reservations (see_reservation, create_reservation, delete_reservation)
+    __table_args__ = (db.Index("ix_user_to_reservation_userid", "UserID", "ReservationID"),)
+
 
 class AccessibilityOptions(db.Model):
     __tablename__ = "Accessibility_Options"
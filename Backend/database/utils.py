@@ -1,9 +1,17 @@
-from Backend.database.models import db, Reservations
-from Backend.data.stops import get_stops_data
-from Backend.data.utils import calc_coord_distance
+import math
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, update
+
+from Backend.database.models import db, Reservations, Stop
+from Backend.data.spatial import KM_PER_DEGREE_LATITUDE
+from Backend.data.stops import get_stops_registry
+from Backend.data.utils import calc_coord_distances
 from Backend.data.timetables import get_timetables
 from Backend.data.models import Timetable
-import pandas as pd
+
+# Half-widths of the bounding boxes show_reservations searches, widest last
+RESERVATION_SEARCH_RADII_KM = (2, 8, 32, 128)
 
 def get_reservation_data(res, latlong=None):
     """
@@ -12,17 +20,180 @@ def get_reservation_data(res, latlong=None):
     
     timetables = get_timetables(origin_id=res["StopID1"],destination_id=res["StopID2"])
     
-    if len(timetables) == 0:
+    if not timetables:  # None if the fetch failed
         return None
 
     timetable = timetables[0].model_dump(mode='json')
     
-    latlongs_df = get_stops_data().reset_index()
-    stop = latlongs_df.loc[latlongs_df.id == res["StopID1"]].iloc[0]
-    timetable["origin_name"] = stop["name"]
-    timetable["street"] = stop["street"]
+    stop = get_stops_registry().get(res["StopID1"])
+    timetable["origin_name"] = stop.name
+    timetable["street"] = stop.street
 
     if latlong is not None: # calculate distance    
-        timetables["distance"] = calc_coord_distance((stop["latitude"], stop["longitude"]), latlong)
+        timetable["distance"] = float(calc_coord_distances([(stop.latitude, stop.longitude)], latlong)[0])
 
     return timetable
+
+
+def reservation_item(reservation, timetables_by_origin):
+    """
+    Joins a reservation with its bus's next departure from the origin stop.
+
+    @param reservation: Reservations
+    @param timetables_by_origin: dict, origin_id -> list of Timetable, from get_timetables_for_origins
+
+    @return: dict, the reservation fields and Timetable fields, or None if the bus is not
+        among the origin's departures
+    """
+    timetables = [t for t in timetables_by_origin.get(reservation.StopID1, [])
+                  if t.vehicle_id == reservation.BusID]
+    if len(timetables) == 0:
+        return None
+
+    return {
+        "reservation_id": reservation.ReservationID,
+        "origin_id": reservation.StopID1,
+        "destination_id": reservation.StopID2,
+        "volunteer_count": reservation.VolunteerCount,
+    } | timetables[0].model_dump()
+
+
+def upcoming_reservations_query(now, until):
+    """
+    @return: Query of (Reservations, stop latitude, stop longitude) rows for reservations
+        after `now` and up to `until`, with their origin stop's coordinates
+    """
+    return (
+        db.session.query(Reservations, Stop.Latitude, Stop.Longitude)
+        .join(Stop, Stop.StopID == Reservations.StopID1)
+        .filter(Reservations.Time > now, Reservations.Time <= until)
+    )
+
+
+def sync_stops(registry=None):
+    """
+    Mirrors the stops dataset into the stop table: new stops are inserted, changed ones
+    updated and stops no longer in the dataset deleted, in one transaction.
+
+    @param registry: StopsRegistry, defaults to the process-wide registry
+
+    @return: tuple of ints, (inserted, updated, deleted)
+    """
+    registry = registry or get_stops_registry()
+    stops = {
+        stop_id: {"StopID": stop_id, "Name": name, "Street": street, "Latitude": latitude, "Longitude": longitude}
+        for stop_id, name, street, latitude, longitude in zip(
+            registry.ids.tolist(), registry.names.tolist(), registry.streets.tolist(),
+            registry.latitudes.tolist(), registry.longitudes.tolist(),
+        )
+    }
+    existing = {
+        row.StopID: row._asdict()
+        for row in db.session.query(Stop.StopID, Stop.Name, Stop.Street, Stop.Latitude, Stop.Longitude)
+    }
+
+    inserts = [stop for stop_id, stop in stops.items() if stop_id not in existing]
+    updates = [stop for stop_id, stop in stops.items() if stop_id in existing and existing[stop_id] != stop]
+    deletes = [stop_id for stop_id in existing if stop_id not in stops]
+
+    if inserts:
+        db.session.execute(insert(Stop), inserts)
+    if updates:
+        db.session.execute(update(Stop), updates)
+    if deletes:
+        db.session.execute(delete(Stop).where(Stop.StopID.in_(deletes)))
+    db.session.commit()
+    return len(inserts), len(updates), len(deletes)
+
+
+def nearest_reservations_query(latlong, limit, radius_km=None, now=None):
+    """
+    Builds the query behind get_nearest_reservations for a single bounding box.
+
+    @param latlong: tuple, (latitude, longitude) of the volunteer
+    @param limit: int, maximum number of rows
+    @param radius_km: float, half-width of the bounding box, or None for no box
+    @param now: datetime, reservations at or before this time are skipped (defaults to now)
+
+    @return: Query of (Reservations, stop latitude, stop longitude) rows, nearest first
+    """
+    latitude, longitude = latlong
+    now = now or datetime.now()
+    longitude_scale = math.cos(math.radians(latitude))
+
+    # Squared equirectangular distance in degrees of latitude, which orders stops the same
+    # way as the true distance at city scale and needs no trigonometry per row
+    delta_latitude = Stop.Latitude - latitude
+    delta_longitude = (Stop.Longitude - longitude) * longitude_scale
+    approximate_distance = delta_latitude * delta_latitude + delta_longitude * delta_longitude
+
+    query = (
+        db.session.query(Reservations, Stop.Latitude, Stop.Longitude)
+        .join(Stop, Stop.StopID == Reservations.StopID1)
+        .filter(Reservations.Time > now)
+    )
+    if radius_km is not None:
+        radius_latitude = radius_km / KM_PER_DEGREE_LATITUDE
+        radius_longitude = radius_latitude / longitude_scale
+        query = query.filter(
+            Stop.Latitude.between(latitude - radius_latitude, latitude + radius_latitude),
+            Stop.Longitude.between(longitude - radius_longitude, longitude + radius_longitude),
+        )
+    return query.order_by(approximate_distance, Reservations.ReservationID).limit(limit)
+
+
+def upcoming_reservations_count_query(now=None):
+    """
+    @return: Query of the number of reservations after `now` with a known origin stop, i.e.
+        the most rows nearest_reservations_query can return
+    """
+    now = now or datetime.now()
+    return (
+        db.session.query(func.count(Reservations.ReservationID))
+        .join(Stop, Stop.StopID == Reservations.StopID1)
+        .filter(Reservations.Time > now)
+    )
+
+
+def get_nearest_reservations(latlong, limit, now=None):
+    """
+    Finds the upcoming reservations whose origin stop is nearest to a location.
+
+    The query filters on a bounding box over the indexed stop coordinates, widening it
+    until the `limit`-th result lies within the box's inscribed circle (so nothing outside
+    the box could be nearer), and orders by distance with a LIMIT inside the database.
+    When a box holds fewer than `limit` reservations, they are counted once: if the box
+    already holds all of them the search stops there, and if there are no more than
+    `limit` in total it skips straight to a single unbounded query.
+
+    @param latlong: tuple, (latitude, longitude) of the volunteer
+    @param limit: int, maximum number of reservations to return
+    @param now: datetime, reservations at or before this time are skipped (defaults to now)
+
+    @return: list of (Reservations, distance in km) pairs, nearest first
+    """
+    if limit <= 0:
+        return []
+
+    now = now or datetime.now()
+    total = None
+    radii = iter(RESERVATION_SEARCH_RADII_KM + (None,))
+    radius_km = next(radii)
+    while True:
+        rows = nearest_reservations_query(latlong, limit, radius_km, now).all()
+        distances = calc_coord_distances([(lat, long) for _, lat, long in rows], latlong).tolist()
+        if radius_km is None or (len(rows) == limit and distances[-1] <= radius_km):
+            break
+        if len(rows) < limit:
+            if total is None:
+                total = upcoming_reservations_count_query(now).scalar()
+            if len(rows) == total:
+                break
+            if total <= limit:
+                radius_km = None
+                continue
+        radius_km = next(radii)
+
+    # The DB orders by an approximation, so settle near-ties by the exact distance
+    nearest = [(reservation, distance) for (reservation, _, _), distance in zip(rows, distances)]
+    return sorted(nearest, key=lambda pair: pair[1])
@@ -0,0 +1,68 @@
+import os
+
+from flask import current_app, request, send_file
+
+from .storage import UPLOAD_FOLDER
+
+# "x-accel" (nginx) or "x-sendfile" (Apache mod_xsendfile, lighttpd) hands the file over to
+# the fronting server, which then also answers Range requests; unset streams it from Python
+DOCUMENT_SENDFILE = os.getenv("DOCUMENT_SENDFILE", "").lower()
+# nginx `internal` location that maps onto UPLOAD_FOLDER, for x-accel
+DOCUMENT_ACCEL_PREFIX = os.getenv("DOCUMENT_ACCEL_PREFIX", "/protected-uploads/")
+# Documents are private and the same URL serves a new one after a re-upload, so caches must revalidate
+DOCUMENT_CACHE_CONTROL = "private, no-cache"
+
+
+def _not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = DOCUMENT_CACHE_CONTROL
+    return response
+
+
+def _offload(document, etag):
+    response = current_app.response_class(mimetype="application/pdf")
+    if DOCUMENT_SENDFILE == "x-accel":
+        relative_path = os.path.relpath(document.FilePath, UPLOAD_FOLDER).replace(os.sep, "/")
+        response.headers["X-Accel-Redirect"] = DOCUMENT_ACCEL_PREFIX.rstrip("/") + "/" + relative_path
+    else:
+        response.headers["X-Sendfile"] = os.path.abspath(document.FilePath)
+    response.headers.set("Content-Disposition", "inline", filename=document.Name)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+def send_document(document):
+    """
+    Sends a stored PDF with a strong ETag (its SHA-256), so a client that already has it
+    gets a 304 without the file being opened, and with Range support for viewers that
+    page through large documents. With DOCUMENT_SENDFILE set, only headers are sent and
+    the fronting server streams the file.
+
+    @param document: Document, with FilePath and (for uploads since content addressing) ContentHash
+
+    @return: Response
+
+    @raises FileNotFoundError: if the file is missing and is being streamed from Python
+    """
+    # Content-addressed documents can be checked against the hash alone; older ones get
+    # werkzeug's ETag from the file's mtime and size
+    etag = document.ContentHash
+    if etag and request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    if DOCUMENT_SENDFILE in ("x-accel", "x-sendfile"):
+        response = _offload(document, etag)
+    else:
+        response = send_file(
+            document.FilePath,
+            mimetype="application/pdf",
+            download_name=document.Name,
+            conditional=True,
+            etag=etag or True,
+        )
+        # werkzeug only advertises ranges once a client has asked for one
+        response.headers.setdefault("Accept-Ranges", "bytes")
+    response.headers["Cache-Control"] = DOCUMENT_CACHE_CONTROL
+    return response
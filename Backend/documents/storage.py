@@ -0,0 +1,174 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+
+from flask import Request
+from sqlalchemy import select
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from Backend.database.models import Document, db
+
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads/")
+STAGING_FOLDER = os.path.join(UPLOAD_FOLDER, ".staging")  # same filesystem, so a stored upload is a rename
+MAX_DOCUMENT_SIZE = int(os.getenv("MAX_DOCUMENT_SIZE", 16 * 1024 * 1024))  # bytes
+PDF_MAGIC = b"%PDF-"
+
+
+class InvalidUpload(Exception):
+    """
+    Raised while an upload is still streaming in, as soon as it cannot be a PDF.
+    """
+
+
+class StagedUpload:
+    """
+    Write-through upload stream: each chunk the multipart parser receives is hashed and
+    written to a temporary file under STAGING_FOLDER. The upload is rejected (and its
+    temporary file removed) as soon as the first bytes are not a PDF header or it grows
+    past MAX_DOCUMENT_SIZE, without waiting for the rest of the request.
+    """
+
+    def __init__(self, max_size=MAX_DOCUMENT_SIZE):
+        os.makedirs(STAGING_FOLDER, exist_ok=True)
+        self.max_size = max_size
+        self.size = 0
+        self.stored_path = None
+        self.created_mtime_ns = None  # set by commit() when it stored a new file rather than reusing one
+        self._sha256 = hashlib.sha256()
+        self._head = b""
+        self._file = tempfile.NamedTemporaryFile(dir=STAGING_FOLDER, suffix=".part", delete=False)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge()
+        if len(self._head) < len(PDF_MAGIC):
+            self._head += data[: len(PDF_MAGIC) - len(self._head)]
+            if not PDF_MAGIC.startswith(self._head):
+                self.discard()
+                raise InvalidUpload("File is not a PDF")
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def validate(self):
+        """
+        @raises InvalidUpload: if the complete upload is too short to be a PDF
+        """
+        if self._head != PDF_MAGIC:
+            raise InvalidUpload("File is not a PDF")
+
+    def commit(self) -> str:
+        """
+        Moves the upload to its content-addressed path, unless an identical document is
+        already stored there, in which case the temporary copy is dropped.
+
+        @return: str, the path of the stored document
+        """
+        self.validate()
+        path = document_path(self.sha256)
+        self._file.flush()
+        self._file.close()
+        try:
+            # Marks the stored copy as in use, so the sweeper leaves it alone until our row
+            # is committed. Touching it first means a copy swept in the meantime is noticed
+            os.utime(path)
+        except FileNotFoundError:
+            # Stamped just behind the clock before it is published, so an upload that reuses
+            # the file (and touches it above) always changes its mtime: see discard_stored_upload
+            stamp = time.time_ns() - 1_000_000_000
+            os.utime(self._file.name, ns=(stamp, stamp))
+            self.created_mtime_ns = os.stat(self._file.name).st_mtime_ns  # as the filesystem keeps it
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._file.name, path)
+        else:
+            os.unlink(self._file.name)
+        self.stored_path = path
+        return path
+
+    def discard(self):
+        if self.stored_path is None:
+            self._file.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._file.name)
+
+    def close(self):
+        # Called by the request when it is torn down: anything not committed is removed
+        self.discard()
+
+    def __getattr__(self, name):
+        # read, seek, tell, readline... for FileStorage
+        return getattr(self._file, name)
+
+
+class DocumentUploadRequest(Request):
+    """
+    Request class that streams uploaded files into StagedUpload instead of buffering them
+    in a spooled temporary file.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return StagedUpload()
+
+
+def document_path(sha256: str) -> str:
+    """
+    @return: str, where a document with this SHA-256 is stored, sharded by its first two
+        bytes (uploads/ab/cd/abcd...pdf) so no directory grows too large
+    """
+    return os.path.join(UPLOAD_FOLDER, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+
+
+def store_upload(file) -> tuple[str, str, int | None]:
+    """
+    @param file: FileStorage from `request.files` of a DocumentUploadRequest
+
+    @return: tuple, (SHA-256 of the document, path it is stored at, the mtime in ns this
+        upload gave that file if it created it, None if it reused an identical stored one)
+
+    @raises InvalidUpload: if the upload is not a PDF
+    """
+    upload = file.stream
+    if not isinstance(upload, StagedUpload):
+        # Not parsed by DocumentUploadRequest (e.g. a test client file), copy it through one
+        upload = StagedUpload()
+        for chunk in iter(lambda: file.stream.read(64 * 1024), b""):
+            upload.write(chunk)
+    try:
+        return upload.sha256, upload.commit(), upload.created_mtime_ns
+    except BaseException:
+        upload.discard()
+        raise
+
+
+def discard_stored_upload(content_hash, path, created_mtime_ns):
+    """
+    Removes a file stored by `store_upload` whose document row could not be committed,
+    unless it was already there before the upload, another upload has reused it since
+    (its mtime no longer matches `created_mtime_ns`) or a committed row uses it.
+    Call it after rolling the session back.
+    """
+    if created_mtime_ns is None:
+        return
+    # Moved aside before checking, so an upload reusing the file from now on finds it
+    # missing and stores its own copy instead of relying on one about to be removed
+    removed = os.path.join(STAGING_FOLDER, f"{uuid.uuid4().hex}.discard")
+    try:
+        os.replace(path, removed)
+    except FileNotFoundError:
+        return
+    shared = os.stat(removed).st_mtime_ns != created_mtime_ns or db.session.execute(
+        select(Document.DocumentID).where(Document.ContentHash == content_hash).limit(1)
+    ).first() is not None
+    if shared:
+        # Identical content, even if another upload has stored the document again meanwhile
+        os.replace(removed, path)
+    else:
+        os.unlink(removed)
@@ -0,0 +1,178 @@
+import itertools
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from Backend.database.models import Document, db
+
+from .storage import STAGING_FOLDER, UPLOAD_FOLDER
+
+DOCUMENT_TEMP_TTL = float(os.getenv("DOCUMENT_TEMP_TTL", 24))  # hours an unlinked temp upload is kept
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", 500))  # rows per DELETE
+SWEEP_BATCH_PAUSE = float(os.getenv("SWEEP_BATCH_PAUSE", 1))  # seconds between batches
+SWEEP_UNLINKS_PER_SECOND = float(os.getenv("SWEEP_UNLINKS_PER_SECOND", 50))
+# Files touched more recently than this are never removed: an upload that deduplicated
+# against a file touches it before its row is committed
+SWEEP_FILE_GRACE = float(os.getenv("SWEEP_FILE_GRACE", 3600))  # seconds
+SHARD_PATTERN = re.compile(r"[0-9a-f]{2}")
+DOCUMENT_FILE_PATTERN = re.compile(r"([0-9a-f]{64})\.pdf")
+
+
+class RateLimiter:
+    """
+    Spaces calls to `wait` at least 1 / `rate` seconds apart.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def _unreferenced(documents):
+    """
+    @param documents: list of (FilePath, ContentHash) of deleted rows
+
+    @return: set, the paths of `documents` that no remaining row points at. Content-addressed
+        files are looked up by their indexed hash, older uploads by path
+    """
+    hashes = {content_hash: path for path, content_hash in documents if content_hash}
+    paths = {path for path, content_hash in documents if not content_hash}
+    unreferenced = set()
+    if hashes:
+        referenced = db.session.execute(
+            select(Document.ContentHash).where(Document.ContentHash.in_(hashes))
+        ).scalars()
+        unreferenced |= {hashes[content_hash] for content_hash in set(hashes) - set(referenced)}
+    if paths:
+        referenced = db.session.execute(
+            select(Document.FilePath).where(Document.FilePath.in_(paths))
+        ).scalars()
+        unreferenced |= paths - set(referenced)
+    return unreferenced
+
+
+def _remove(path, limiter, cutoff) -> int:
+    """
+    @return: int, the bytes freed by removing `path` (0 if it is missing or too recent)
+    """
+    limiter.wait()
+    try:
+        stat = os.stat(path)
+        if stat.st_mtime > cutoff:
+            return 0
+        os.unlink(path)
+    except FileNotFoundError:
+        return 0
+    return stat.st_size
+
+
+def _stored_documents(cutoff):
+    """
+    @return: iterator of (content hash, path) of the content-addressed files under
+        UPLOAD_FOLDER last touched before `cutoff`
+    """
+    if not os.path.isdir(UPLOAD_FOLDER):
+        return
+    for shard in os.scandir(UPLOAD_FOLDER):
+        if not (shard.is_dir() and SHARD_PATTERN.fullmatch(shard.name)):
+            continue
+        for subshard in os.scandir(shard.path):
+            if not (subshard.is_dir() and SHARD_PATTERN.fullmatch(subshard.name)):
+                continue
+            for entry in os.scandir(subshard.path):
+                match = DOCUMENT_FILE_PATTERN.fullmatch(entry.name)
+                try:
+                    if match and entry.stat().st_mtime <= cutoff:
+                        yield match.group(1), entry.path
+                except FileNotFoundError:
+                    continue
+
+
+def _sweep_orphans(limiter, cutoff, batch_size, report):
+    """
+    Removes content-addressed files that no document row references: those whose rows
+    were swept while the file was still within SWEEP_FILE_GRACE, and those left by an
+    upload that stopped before its row was committed.
+    """
+    candidates = _stored_documents(cutoff)
+    while batch := dict(itertools.islice(candidates, batch_size)):
+        referenced = db.session.execute(
+            select(Document.ContentHash).where(Document.ContentHash.in_(batch))
+        ).scalars()
+        for content_hash in set(batch) - set(referenced):
+            freed = _remove(batch[content_hash], limiter, cutoff)
+            report["files"] += bool(freed)
+            report["bytes"] += freed
+        db.session.rollback()  # ends the read transaction between batches
+
+
+def sweep_documents(now=None, ttl_hours=DOCUMENT_TEMP_TTL, batch_size=SWEEP_BATCH_SIZE,
+                    pause=SWEEP_BATCH_PAUSE, unlinks_per_second=SWEEP_UNLINKS_PER_SECOND) -> dict:
+    """
+    Deletes temp documents (uploaded at signup, never linked to a user) older than
+    `ttl_hours`, one bulk DELETE ... RETURNING per batch, then removes their files unless
+    another document still uses them. Batches are `pause` seconds apart and file removals
+    are rate limited, so a large backlog is worked through slowly rather than competing
+    with requests. Files still within SWEEP_FILE_GRACE are kept and, once their rows are
+    gone, removed by the orphan pass of a later sweep. Leftover staging files from
+    interrupted uploads are removed too.
+
+    @return: dict, rows deleted, files removed, bytes freed and batches run
+    """
+    now = now or datetime.now()
+    expired_before = now - timedelta(hours=ttl_hours)
+    file_cutoff = time.time() - SWEEP_FILE_GRACE
+    limiter = RateLimiter(unlinks_per_second)
+    report = {"rows": 0, "files": 0, "bytes": 0, "batches": 0}
+
+    while True:
+        expired = (
+            select(Document.DocumentID)
+            .where(
+                Document.UserID.is_(None),
+                Document.TempUserID.isnot(None),
+                Document.CreatedAt < expired_before,
+            )
+            .order_by(Document.DocumentID)
+            .limit(batch_size)
+        )
+        # The outer UserID condition is rechecked on rows updated while the DELETE runs,
+        # so a document linked to a user mid-sweep is kept
+        documents = db.session.execute(
+            delete(Document)
+            .where(Document.DocumentID.in_(expired), Document.UserID.is_(None))
+            .returning(Document.FilePath, Document.ContentHash)
+        ).all()
+        db.session.commit()
+        if not documents:
+            break
+
+        report["batches"] += 1
+        report["rows"] += len(documents)
+        for path in _unreferenced(documents):
+            freed = _remove(path, limiter, file_cutoff)
+            report["files"] += bool(freed)
+            report["bytes"] += freed
+
+        if len(documents) < batch_size:
+            break
+        time.sleep(pause)
+
+    _sweep_orphans(limiter, file_cutoff, batch_size, report)
+
+    if os.path.isdir(STAGING_FOLDER):
+        for entry in os.scandir(STAGING_FOLDER):
+            freed = _remove(entry.path, limiter, file_cutoff)
+            report["files"] += bool(freed)
+            report["bytes"] += freed
+
+    return report
@@ -0,0 +1,61 @@
+"""
+Gunicorn settings for serving `Backend.app:create_app()`, tuned from the environment:
+
+    GUNICORN_WORKERS        worker processes (default: one per available CPU)
+    GUNICORN_WORKER_CLASS   "gthread" (default) or "gevent" (the reservation_stream service)
+    GUNICORN_THREADS        request threads per gthread worker (default 4)
+    GUNICORN_BIND           address to listen on (default 0.0.0.0:5000)
+    GUNICORN_TIMEOUT        seconds before a silent worker is restarted (default 60)
+    POSTGRES_MAX_CONNECTIONS  the server's max_connections, used to check the pool budget (default 100)
+
+Each worker has its own SQLAlchemy pool of DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+(see Backend/app.py), so the container needs workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) of them.
+"""
+import os
+
+
+def available_cpus():
+    # Respect CPU affinity (e.g. docker --cpuset-cpus), falling back to the host count
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", available_cpus()))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Restart workers now and then so slow leaks cannot build up; the jitter stops them restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+
+
+def on_starting(server):
+    pool_size = int(os.getenv("DB_POOL_SIZE", threads))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 2))
+    max_connections = int(os.getenv("POSTGRES_MAX_CONNECTIONS", 100))
+
+    needed = workers * (pool_size + max_overflow)
+    server.log.info(
+        f"{workers} {worker_class} workers x {threads} threads, up to {needed} DB connections"
+    )
+    if needed > max_connections:
+        server.log.warning(
+            f"Workers may open {needed} DB connections but Postgres allows {max_connections}: "
+            "lower GUNICORN_WORKERS, DB_POOL_SIZE or DB_MAX_OVERFLOW"
+        )
+
+
+def post_worker_init(worker):
+    # Start polling vehicle positions as the worker boots, rather than in whichever
+    # request first asks for an ETA. Not in post_fork: gevent workers monkey-patch after
+    # it, and the requests/ssl imports must come after that
+    from Backend.data.vehicles import get_vehicle_poller
+
+    get_vehicle_poller()